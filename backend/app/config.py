@@ -21,8 +21,33 @@ class Settings:
     
     # Upload
     MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB", "5"))
+    MAX_UPLOAD_FILES: int = int(os.getenv("MAX_UPLOAD_FILES", "10"))  # files per request
     ALLOWED_EXTENSIONS: list = os.getenv("ALLOWED_EXTENSIONS", "jpg,jpeg,png,webp").split(",")
     UPLOAD_DIR: str = "uploads"
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    IMAGE_QUEUE_DEPTH: int = int(os.getenv("IMAGE_QUEUE_DEPTH", "16"))
+    UPLOAD_PARALLELISM: int = int(os.getenv("UPLOAD_PARALLELISM", "4"))  # files per request
+    MAX_IMAGE_PIXELS: int = int(os.getenv("MAX_IMAGE_PIXELS", "50000000"))  # ~48MP phone photos fit
+    RESIZE_CACHE_DIR: str = os.getenv("RESIZE_CACHE_DIR", "cache/resized")
+    RESIZE_CACHE_MAX_MB: int = int(os.getenv("RESIZE_CACHE_MAX_MB", "256"))
+    RESIZE_MAX_DIMENSION: int = int(os.getenv("RESIZE_MAX_DIMENSION", "2000"))
+    IMAGE_GC_INTERVAL_SECONDS: float = float(os.getenv("IMAGE_GC_INTERVAL_SECONDS", "3600"))  # 0 disables
+    IMAGE_GC_GRACE_SECONDS: float = float(os.getenv("IMAGE_GC_GRACE_SECONDS", "86400"))
+    IMAGE_GC_BATCH_SIZE: int = int(os.getenv("IMAGE_GC_BATCH_SIZE", "500"))
+    
+    # Catalog cache
+    CATALOG_CACHE_SIZE: int = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+    CATALOG_CACHE_TTL_SECONDS: float = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+    
+    # Idempotency-Key handling for order creation
+    IDEMPOTENCY_KEY_TTL_SECONDS: float = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_LOCK_SECONDS: float = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))  # abandon in-progress keys
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))  # duplicate waits this long
+    
+    # Shop sidebar price buckets (KSh boundaries)
+    PRICE_BUCKETS: list = [
+        float(x) for x in os.getenv("PRICE_BUCKETS", "10000,25000,50000,100000").split(",")
+    ]
     
     # CORS
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -1,9 +1,8 @@
 """
 Dan Classic Furniture - FastAPI Main Application
 """
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -11,9 +10,16 @@ from slowapi.errors import RateLimitExceeded
 import os
 
 from app.config import settings
-from app.database import init_db
-from app.routers import auth, products, orders, dashboard
+from app.database import init_db, async_engine
+from app.routers import auth, products, orders, dashboard, images
 from app.routers.products import categories_router
+from app.models.user import User
+from app.utils.auth import get_admin_user
+from app.utils.cache import catalog_cache
+from app.utils.uploads import image_processor
+from app.utils.image_cache import resize_cache
+from app.utils.image_gc import orphan_collector
+from app.utils.static import UploadFiles
 
 # Create FastAPI app
 app = FastAPI(
@@ -43,8 +49,11 @@ os.makedirs("uploads", exist_ok=True)
 os.makedirs("uploads/products", exist_ok=True)
 os.makedirs("uploads/categories", exist_ok=True)
 
-# Serve static files (uploads)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Resized images (must be registered before the /uploads mount)
+app.include_router(images.router)
+
+# Serve uploaded images (immutable, ETag and range aware)
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
@@ -59,10 +68,19 @@ async def startup():
     """Initialize database on startup"""
     init_db()
     print("[OK] Database initialized")
+    orphan_collector.start()
     print("Dan Classic Furniture API is running!")
     print(f"API Documentation: http://localhost:8000/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background jobs, release pooled connections and image workers"""
+    await orphan_collector.stop()
+    await async_engine.dispose()
+    image_processor.shutdown()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -80,6 +98,30 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/metrics/cache")
+async def cache_metrics(admin: User = Depends(get_admin_user)):
+    """Catalog cache hit/miss counters for this worker (Admin only)"""
+    return catalog_cache.stats()
+
+
+@app.get("/api/metrics/images")
+async def image_metrics(admin: User = Depends(get_admin_user)):
+    """Image processing pool counters and timings for this worker (Admin only)"""
+    return image_processor.stats()
+
+
+@app.get("/api/metrics/resize-cache")
+async def resize_cache_metrics(admin: User = Depends(get_admin_user)):
+    """On-demand resize cache counters for this worker (Admin only)"""
+    return resize_cache.stats()
+
+
+@app.get("/api/metrics/image-gc")
+async def image_gc_metrics(admin: User = Depends(get_admin_user)):
+    """Orphan image collector counters for this worker (Admin only)"""
+    return orphan_collector.stats()
+
+
 @app.get("/api/config")
 async def get_config():
     """Get public configuration (WhatsApp number, etc.)"""
@@ -0,0 +1,70 @@
+"""
+Dan Classic Furniture - Schema Migrations
+Each module in app/migrations/versions is named vNNNN_description.py and
+defines upgrade(conn). Applied versions are recorded in schema_migrations.
+"""
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.migrations import versions
+
+MIGRATION_NAME = re.compile(r"^v(\d{4})_(\w+)$")
+
+# Arbitrary key for the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK_ID = 720_415
+
+
+def discover_migrations() -> list[tuple[int, str, object]]:
+    """Return (version, name, module) for every migration, in order"""
+    found = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        match = MIGRATION_NAME.match(info.name)
+        if match:
+            module = importlib.import_module(f"{versions.__name__}.{info.name}")
+            found.append((int(match.group(1)), match.group(2), module))
+    return sorted(found, key=lambda m: m[0])
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Apply pending migrations, each in its own transaction"""
+    applied_now = []
+    with engine.connect() as conn:
+        is_postgres = conn.dialect.name == "postgresql"
+        if is_postgres:
+            # Serialize workers that start at the same time
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+        try:
+            with conn.begin():
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INTEGER PRIMARY KEY, "
+                    "name VARCHAR(255) NOT NULL, "
+                    "applied_at TIMESTAMP NOT NULL)"
+                ))
+            
+            for version, name, module in discover_migrations():
+                with conn.begin():
+                    done = conn.execute(
+                        text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                        {"version": version}
+                    ).first()
+                    if done:
+                        continue
+                    module.upgrade(conn)
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, applied_at) "
+                             "VALUES (:version, :name, :applied_at)"),
+                        {"version": version, "name": name, "applied_at": datetime.utcnow()}
+                    )
+                applied_now.append(version)
+                print(f"[OK] Applied migration {version:04d} {name}")
+        finally:
+            if is_postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                conn.commit()
+    return applied_now
@@ -0,0 +1 @@
+"""Dan Classic Furniture - Migration Versions"""
@@ -0,0 +1,35 @@
+"""
+Add products.material_key and backfill it and product_colors from the
+JSON colors / free-text material columns.
+"""
+from sqlalchemy import inspect, text, select, update, delete, insert, bindparam
+
+from app.models.product import Product, ProductColor, normalize_facet
+
+
+def upgrade(conn):
+    columns = {col["name"] for col in inspect(conn).get_columns("products")}
+    if "material_key" not in columns:
+        conn.execute(text("ALTER TABLE products ADD COLUMN material_key VARCHAR(100)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_products_material_key ON products (material_key)"))
+    
+    products = conn.execute(select(Product.id, Product.material, Product.colors)).all()
+    if products:
+        # Keep updated_at as is: normalizing does not change what is served
+        conn.execute(
+            update(Product.__table__)
+            .where(Product.id == bindparam("product_id"))
+            .values(material_key=bindparam("normalized"), updated_at=Product.updated_at),
+            [
+                {"product_id": product_id, "normalized": normalize_facet(material)}
+                for product_id, material, _ in products
+            ]
+        )
+    
+    conn.execute(delete(ProductColor))
+    color_rows = []
+    for product_id, _, colors in products:
+        normalized = {normalize_facet(color) for color in (colors or [])} - {None}
+        color_rows += [{"product_id": product_id, "color": color} for color in sorted(normalized)]
+    if color_rows:
+        conn.execute(insert(ProductColor), color_rows)
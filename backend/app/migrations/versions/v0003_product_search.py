@@ -0,0 +1,8 @@
+"""
+Create the product full-text search index (FTS5 on SQLite, GIN on PostgreSQL).
+"""
+from app.utils.search import init_search
+
+
+def upgrade(conn):
+    init_search(conn)
@@ -0,0 +1,25 @@
+"""
+Add foreign-key and composite indexes for the product listing, order list
+and dashboard queries.
+"""
+from sqlalchemy import text
+
+INDEXES = [
+    ("ix_products_category_id", "products", "category_id"),
+    ("ix_products_active_created", "products", "is_active, created_at"),
+    ("ix_products_active_category_created", "products", "is_active, category_id, created_at"),
+    ("ix_products_active_featured_created", "products", "is_active, featured, created_at"),
+    ("ix_products_active_price", "products", "is_active, price"),
+    ("ix_products_active_stock", "products", "is_active, stock"),
+    ("ix_orders_created_at", "orders", "created_at"),
+    ("ix_orders_status_created", "orders", "status, created_at"),
+    ("ix_orders_customer_created", "orders", "customer_id, created_at"),
+    ("ix_order_items_order_id", "order_items", "order_id"),
+    ("ix_order_items_product_id", "order_items", "product_id"),
+    ("ix_order_timeline_order_created", "order_timeline", "order_id, created_at"),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
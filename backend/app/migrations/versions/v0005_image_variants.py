@@ -0,0 +1,11 @@
+"""
+Add products.image_variants for responsive image sizes. Existing images
+have no variants and are served at their stored size.
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(conn):
+    columns = {col["name"] for col in inspect(conn).get_columns("products")}
+    if "image_variants" not in columns:
+        conn.execute(text("ALTER TABLE products ADD COLUMN image_variants JSON"))
@@ -0,0 +1,10 @@
+"""
+Add the stored_images table for content-addressed, reference counted
+uploads. Images uploaded before this are left where they are and are not
+reference counted.
+"""
+from app.models.image import StoredImage
+
+
+def upgrade(conn):
+    StoredImage.__table__.create(bind=conn, checkfirst=True)
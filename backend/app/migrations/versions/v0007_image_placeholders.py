@@ -0,0 +1,13 @@
+"""
+Add inline image placeholders to products and stored images. Existing
+images get theirs from backfill_placeholders.py.
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(conn):
+    inspector = inspect(conn)
+    if "image_placeholders" not in {col["name"] for col in inspector.get_columns("products")}:
+        conn.execute(text("ALTER TABLE products ADD COLUMN image_placeholders JSON"))
+    if "placeholder" not in {col["name"] for col in inspector.get_columns("stored_images")}:
+        conn.execute(text("ALTER TABLE stored_images ADD COLUMN placeholder TEXT"))
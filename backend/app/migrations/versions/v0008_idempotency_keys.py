@@ -0,0 +1,8 @@
+"""
+Add the idempotency_keys table used to replay order creation retries.
+"""
+from app.models.idempotency import IdempotencyKey
+
+
+def upgrade(conn):
+    IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
@@ -1,6 +1,11 @@
 """Dan Classic Furniture - Models Package"""
 from app.models.user import User
-from app.models.product import Category, Product
+from app.models.product import Category, Product, ProductColor
 from app.models.order import Order, OrderItem, OrderTimeline
+from app.models.image import StoredImage
+from app.models.idempotency import IdempotencyKey
 
-__all__ = ["User", "Category", "Product", "Order", "OrderItem", "OrderTimeline"]
+__all__ = [
+    "User", "Category", "Product", "ProductColor", "Order", "OrderItem", "OrderTimeline",
+    "StoredImage", "IdempotencyKey"
+]
@@ -0,0 +1,28 @@
+"""
+Dan Classic Furniture - Idempotency Key Model
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from datetime import datetime
+
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """A client-supplied Idempotency-Key and the response it produced
+    
+    The row is inserted before the request runs (status_code NULL) so that
+    duplicates can see it, and filled in when the request succeeds.
+    expires_at is short while in progress and extended once completed.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of the request body
+    status_code = Column(Integer, nullable=True)  # NULL while in progress
+    response_body = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey {self.user_id}:{self.key} {self.status_code}>"
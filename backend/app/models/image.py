@@ -0,0 +1,26 @@
+"""
+Dan Classic Furniture - Stored Image Model
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON
+from datetime import datetime
+
+from app.database import Base
+
+
+class StoredImage(Base):
+    """A content-addressed upload, shared by every product/category using it
+    
+    ref_count counts the occurrences of path in Product.images and
+    Category.image; the files are deleted when it drops to zero.
+    """
+    __tablename__ = "stored_images"
+    
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the uploaded bytes
+    path = Column(String(500), unique=True, nullable=False)  # "/uploads/images/ab/<hash>.jpg"
+    variants = Column(JSON, default=dict)
+    placeholder = Column(Text, nullable=True)  # data URI preview
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<StoredImage {self.path} refs={self.ref_count}>"
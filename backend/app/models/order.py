@@ -1,7 +1,7 @@
 """
 Dan Classic Furniture - Order Models
 """
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -48,6 +48,13 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     timeline = relationship("OrderTimeline", back_populates="order", cascade="all, delete-orphan")
     
+    # Indexes matching the order list and dashboard query shapes
+    __table_args__ = (
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_status_created", "status", "created_at"),
+        Index("ix_orders_customer_created", "customer_id", "created_at"),
+    )
+    
     def __repr__(self):
         return f"<Order {self.order_number}>"
 
@@ -74,6 +81,11 @@ class OrderItem(Base):
     # Relationships
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
+    
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        Index("ix_order_items_product_id", "product_id"),
+    )
 
 
 class OrderTimeline(Base):
@@ -89,3 +101,7 @@ class OrderTimeline(Base):
     
     # Relationships
     order = relationship("Order", back_populates="timeline")
+    
+    __table_args__ = (
+        Index("ix_order_timeline_order_created", "order_id", "created_at"),
+    )
@@ -1,13 +1,22 @@
 """
 Dan Classic Furniture - Product & Category Models
 """
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship, validates
+from typing import Optional
 from datetime import datetime
 
 from app.database import Base
 
 
+def normalize_facet(value: Optional[str]) -> Optional[str]:
+    """Normalize a color/material value for indexed exact-match filtering"""
+    if value is None:
+        return None
+    value = " ".join(value.split()).lower()
+    return value or None
+
+
 class Category(Base):
     __tablename__ = "categories"
     
@@ -42,10 +51,15 @@ class Product(Base):
     # Physical details
     dimensions = Column(String(100), nullable=True)  # e.g., "120x80x45 cm"
     material = Column(String(100), nullable=True)  # e.g., "Leather", "Fabric"
+    material_key = Column(String(100), nullable=True, index=True)  # normalized material for filtering
     colors = Column(JSON, default=list)  # ["Brown", "Black", "Grey"]
     
     # Images stored as JSON array of paths
     images = Column(JSON, default=list)  # ["/uploads/img1.jpg", "/uploads/img2.jpg"]
+    # Responsive variants per image: {"/uploads/img1.jpg": {"thumb": {"width", "jpeg", "webp"}, ...}}
+    image_variants = Column(JSON, default=dict)
+    # Inline low-quality previews per image: {"/uploads/img1.jpg": "data:image/webp;base64,..."}
+    image_placeholders = Column(JSON, default=dict)
     
     # Flags
     featured = Column(Boolean, default=False)
@@ -59,9 +73,24 @@ class Product(Base):
     category = relationship("Category", back_populates="products")
     order_items = relationship("OrderItem", back_populates="product")
     
+    # Indexes matching the storefront filter/sort combinations
+    __table_args__ = (
+        Index("ix_products_category_id", "category_id"),
+        Index("ix_products_active_created", "is_active", "created_at"),
+        Index("ix_products_active_category_created", "is_active", "category_id", "created_at"),
+        Index("ix_products_active_featured_created", "is_active", "featured", "created_at"),
+        Index("ix_products_active_price", "is_active", "price"),
+        Index("ix_products_active_stock", "is_active", "stock"),
+    )
+    
     def __repr__(self):
         return f"<Product {self.name}>"
     
+    @validates("material")
+    def _sync_material_key(self, key, value):
+        self.material_key = normalize_facet(value)
+        return value
+    
     @property
     def is_on_sale(self):
         return self.compare_price and self.compare_price > self.price
@@ -71,3 +100,15 @@ class Product(Base):
         if self.is_on_sale:
             return int(((self.compare_price - self.price) / self.compare_price) * 100)
         return 0
+
+
+class ProductColor(Base):
+    """Normalized copy of Product.colors, one row per product/color"""
+    __tablename__ = "product_colors"
+    
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    color = Column(String(50), primary_key=True)  # normalized, e.g. "brown"
+    
+    __table_args__ = (
+        Index("ix_product_colors_color_product", "color", "product_id"),
+    )
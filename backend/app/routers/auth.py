@@ -2,7 +2,8 @@
 Dan Classic Furniture - Auth Router
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -23,17 +24,17 @@ limiter = Limiter(key_func=get_remote_address)
 
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new customer account"""
     # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User).where(User.email == user_data.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Check if phone exists
-    if db.query(User).filter(User.phone == user_data.phone).first():
+    if await db.scalar(select(User).where(User.phone == user_data.phone)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Phone number already registered"
@@ -49,8 +50,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         role=UserRole.CUSTOMER
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Generate tokens
     access_token = create_access_token(data={"sub": str(user.id), "role": user.role.value})
@@ -60,9 +61,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login with email and password"""
-    user = db.query(User).filter(User.email == user_data.email).first()
+    user = await db.scalar(select(User).where(User.email == user_data.email))
     
     if not user or not verify_password(user_data.password, user.password_hash):
         raise HTTPException(
@@ -78,7 +79,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(token_data: RefreshToken, db: Session = Depends(get_db)):
+async def refresh_token(token_data: RefreshToken, db: AsyncSession = Depends(get_db)):
     """Refresh access token using refresh token"""
     payload = decode_token(token_data.refresh_token)
     
@@ -89,7 +90,7 @@ async def refresh_token(token_data: RefreshToken, db: Session = Depends(get_db))
         )
     
     user_id = payload.get("sub")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == int(user_id))) if user_id else None
     
     if not user:
         raise HTTPException(
@@ -114,17 +115,17 @@ async def get_me(current_user: User = Depends(get_current_user)):
 async def update_me(
     user_data: UserUpdate, 
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update current user profile"""
     if user_data.full_name:
         current_user.full_name = user_data.full_name
     if user_data.phone:
         # Check if phone already used by another user
-        existing = db.query(User).filter(
+        existing = await db.scalar(select(User).where(
             User.phone == user_data.phone, 
             User.id != current_user.id
-        ).first()
+        ))
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -134,8 +135,8 @@ async def update_me(
     if user_data.address is not None:
         current_user.address = user_data.address
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(current_user)
     return current_user
 
 
@@ -143,7 +144,7 @@ async def update_me(
 async def change_password(
     password_data: PasswordChange,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Change current user's password"""
     
@@ -156,6 +157,6 @@ async def change_password(
     
     # Update password
     current_user.password_hash = get_password_hash(password_data.new_password)
-    db.commit()
+    await db.commit()
     
     return {"message": "Password updated successfully"}
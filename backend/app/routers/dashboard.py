@@ -2,8 +2,9 @@
 Dan Classic Furniture - Dashboard & Analytics Router
 """
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import select, func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -21,7 +22,7 @@ router = APIRouter(prefix="/admin", tags=["Admin Dashboard"])
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get dashboard statistics"""
     now = datetime.utcnow()
@@ -30,39 +31,45 @@ async def get_dashboard_stats(
     month_start = today_start.replace(day=1)
     
     # Product stats
-    total_products = db.query(Product).filter(Product.is_active == True).count()
-    low_stock_count = db.query(Product).filter(
+    total_products = await db.scalar(
+        select(func.count(Product.id)).where(Product.is_active == True)
+    )
+    low_stock_count = await db.scalar(select(func.count(Product.id)).where(
         Product.is_active == True,
         Product.stock < 5
-    ).count()
+    ))
     
     # Order stats
-    total_orders = db.query(Order).count()
-    orders_today = db.query(Order).filter(Order.created_at >= today_start).count()
-    orders_this_week = db.query(Order).filter(Order.created_at >= week_start).count()
-    orders_this_month = db.query(Order).filter(Order.created_at >= month_start).count()
-    pending_orders = db.query(Order).filter(Order.status == OrderStatus.PENDING).count()
+    total_orders = await db.scalar(select(func.count(Order.id)))
+    orders_today = await db.scalar(select(func.count(Order.id)).where(Order.created_at >= today_start))
+    orders_this_week = await db.scalar(select(func.count(Order.id)).where(Order.created_at >= week_start))
+    orders_this_month = await db.scalar(select(func.count(Order.id)).where(Order.created_at >= month_start))
+    pending_orders = await db.scalar(
+        select(func.count(Order.id)).where(Order.status == OrderStatus.PENDING)
+    )
     
     # Revenue stats (only from delivered/confirmed orders)
     completed_statuses = [OrderStatus.CONFIRMED, OrderStatus.DELIVERED]
     
-    revenue_today = db.query(func.sum(Order.total)).filter(
+    revenue_today = await db.scalar(select(func.sum(Order.total)).where(
         Order.created_at >= today_start,
         Order.status.in_(completed_statuses)
-    ).scalar() or 0
+    )) or 0
     
-    revenue_this_week = db.query(func.sum(Order.total)).filter(
+    revenue_this_week = await db.scalar(select(func.sum(Order.total)).where(
         Order.created_at >= week_start,
         Order.status.in_(completed_statuses)
-    ).scalar() or 0
+    )) or 0
     
-    revenue_this_month = db.query(func.sum(Order.total)).filter(
+    revenue_this_month = await db.scalar(select(func.sum(Order.total)).where(
         Order.created_at >= month_start,
         Order.status.in_(completed_statuses)
-    ).scalar() or 0
+    )) or 0
     
     # Customer stats
-    total_customers = db.query(User).filter(User.role == UserRole.CUSTOMER).count()
+    total_customers = await db.scalar(
+        select(func.count(User.id)).where(User.role == UserRole.CUSTOMER)
+    )
     
     return DashboardStats(
         total_products=total_products,
@@ -83,12 +90,12 @@ async def get_dashboard_stats(
 async def get_revenue_by_category(
     days: int = Query(30, ge=1, le=365),
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get revenue breakdown by category"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    results = db.query(
+    results = (await db.execute(select(
         Category.name,
         func.sum(OrderItem.product_price * OrderItem.quantity).label('revenue'),
         func.count(OrderItem.id).label('order_count')
@@ -98,10 +105,10 @@ async def get_revenue_by_category(
         OrderItem, OrderItem.product_id == Product.id
     ).join(
         Order, Order.id == OrderItem.order_id
-    ).filter(
+    ).where(
         Order.created_at >= start_date,
         Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.DELIVERED])
-    ).group_by(Category.name).all()
+    ).group_by(Category.name))).all()
     
     return [
         RevenueByCategory(
@@ -118,12 +125,12 @@ async def get_top_products(
     limit: int = Query(10, ge=1, le=50),
     days: int = Query(30, ge=1, le=365),
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get best-selling products"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    results = db.query(
+    results = (await db.execute(select(
         Product.id,
         Product.name,
         Product.images,
@@ -133,12 +140,12 @@ async def get_top_products(
         OrderItem, OrderItem.product_id == Product.id
     ).join(
         Order, Order.id == OrderItem.order_id
-    ).filter(
+    ).where(
         Order.created_at >= start_date,
         Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.DELIVERED])
     ).group_by(
         Product.id, Product.name, Product.images
-    ).order_by(desc('total_sold')).limit(limit).all()
+    ).order_by(desc('total_sold')).limit(limit))).all()
     
     return [
         TopProduct(
@@ -156,13 +163,13 @@ async def get_top_products(
 async def get_low_stock_products(
     threshold: int = Query(5, ge=1),
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get products with low stock"""
-    products = db.query(Product).filter(
+    products = (await db.scalars(select(Product).where(
         Product.is_active == True,
         Product.stock <= threshold
-    ).order_by(Product.stock.asc()).all()
+    ).order_by(Product.stock.asc()))).all()
     
     return [
         {
@@ -179,10 +186,12 @@ async def get_low_stock_products(
 async def get_recent_orders(
     limit: int = Query(10, ge=1, le=50),
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get recent orders"""
-    orders = db.query(Order).order_by(desc(Order.created_at)).limit(limit).all()
+    orders = (await db.scalars(
+        select(Order).options(selectinload(Order.items)).order_by(desc(Order.created_at)).limit(limit)
+    )).all()
     
     return [
         {
@@ -206,22 +215,24 @@ async def get_customers(
     limit: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all customers"""
     
-    query = db.query(User).filter(User.role == UserRole.CUSTOMER)
+    query = select(User).where(User.role == UserRole.CUSTOMER)
     
     if search:
-        query = query.filter(
+        query = query.where(
             (User.full_name.ilike(f"%{search}%")) |
             (User.email.ilike(f"%{search}%")) |
             (User.phone.ilike(f"%{search}%"))
         )
     
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     pages = (total + limit - 1) // limit
-    users = query.order_by(desc(User.created_at)).offset((page - 1) * limit).limit(limit).all()
+    users = (await db.scalars(
+        query.order_by(desc(User.created_at)).offset((page - 1) * limit).limit(limit)
+    )).all()
     
     return UserListResponse(users=users, total=total, page=page, pages=pages)
 
@@ -230,25 +241,25 @@ async def get_customers(
 async def get_customer_details(
     customer_id: int,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get customer details with order history"""
-    customer = db.query(User).filter(
+    customer = await db.scalar(select(User).where(
         User.id == customer_id,
         User.role == UserRole.CUSTOMER
-    ).first()
+    ))
     
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    orders = db.query(Order).filter(
+    orders = (await db.scalars(select(Order).where(
         Order.customer_id == customer_id
-    ).order_by(desc(Order.created_at)).all()
+    ).order_by(desc(Order.created_at)))).all()
     
-    total_spent = db.query(func.sum(Order.total)).filter(
+    total_spent = await db.scalar(select(func.sum(Order.total)).where(
         Order.customer_id == customer_id,
         Order.status.in_([OrderStatus.CONFIRMED, OrderStatus.DELIVERED])
-    ).scalar() or 0
+    )) or 0
     
     return {
         "customer": UserResponse.model_validate(customer),
@@ -276,29 +287,31 @@ async def get_all_users(
     role: Optional[str] = None,
     search: Optional[str] = None,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all users (admins and customers) with optional role filter"""
     
-    query = db.query(User)
+    query = select(User)
     
     # Filter by role if specified
     if role:
         if role == "admin":
-            query = query.filter(User.role == UserRole.ADMIN)
+            query = query.where(User.role == UserRole.ADMIN)
         elif role == "customer":
-            query = query.filter(User.role == UserRole.CUSTOMER)
+            query = query.where(User.role == UserRole.CUSTOMER)
     
     if search:
-        query = query.filter(
+        query = query.where(
             (User.full_name.ilike(f"%{search}%")) |
             (User.email.ilike(f"%{search}%")) |
             (User.phone.ilike(f"%{search}%"))
         )
     
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     pages = (total + limit - 1) // limit
-    users = query.order_by(desc(User.created_at)).offset((page - 1) * limit).limit(limit).all()
+    users = (await db.scalars(
+        query.order_by(desc(User.created_at)).offset((page - 1) * limit).limit(limit)
+    )).all()
     
     return UserListResponse(users=users, total=total, page=page, pages=pages)
 
@@ -307,19 +320,19 @@ async def get_all_users(
 async def create_admin_user(
     user_data: AdminUserCreate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new admin or customer user (Admin only)"""
     
     # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User).where(User.email == user_data.email)):
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
     # Check if phone exists
-    if db.query(User).filter(User.phone == user_data.phone).first():
+    if await db.scalar(select(User).where(User.phone == user_data.phone)):
         raise HTTPException(
             status_code=400,
             detail="Phone number already registered"
@@ -335,7 +348,7 @@ async def create_admin_user(
         role=user_data.role
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
@@ -0,0 +1,32 @@
+"""
+Dan Classic Furniture - On-Demand Image Resize Router
+"""
+import asyncio
+from fastapi import APIRouter, HTTPException
+
+from app.config import settings
+from app.utils.image_cache import resize_cache
+from app.utils.static import UploadFileResponse
+from app.utils.uploads import get_upload_path
+
+router = APIRouter(prefix="/uploads/resize", tags=["Images"])
+
+
+@router.get("/{width:int}x{height:int}/{path:path}")
+async def resize_upload(width: int, height: int, path: str):
+    """Serve an upload scaled to fit within width x height (never upscaled)"""
+    if not (0 < width <= settings.RESIZE_MAX_DIMENSION and 0 < height <= settings.RESIZE_MAX_DIMENSION):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Width and height must be between 1 and {settings.RESIZE_MAX_DIMENSION}"
+        )
+    
+    root = get_upload_path().resolve()
+    source = (root / path).resolve()
+    extension = source.suffix.lower().lstrip(".")
+    if (not source.is_relative_to(root) or extension not in settings.ALLOWED_EXTENSIONS
+            or not source.is_file()):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    resized = await resize_cache.get(source, width, height)
+    return UploadFileResponse(resized, await asyncio.to_thread(resized.stat), media_type="image/jpeg")
@@ -1,10 +1,11 @@
 """
 Dan Classic Furniture - Orders Router
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
+from sqlalchemy import select, update, insert, func, desc, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Optional, Union
 from datetime import datetime
 import uuid
 
@@ -14,42 +15,270 @@ from app.models.product import Product
 from app.models.order import Order, OrderItem, OrderTimeline, OrderStatus
 from app.schemas.order import (
     OrderCreate, OrderUpdate, OrderStatusUpdate, OrderResponse, 
-    OrderWithTimeline, OrderListResponse
+    OrderWithTimeline, OrderListResponse, OrderSummary, OrderSummaryListResponse,
+    OrderBulkStatusUpdate, OrderBulkStatusResult, OrderBulkStatusResponse
 )
 from app.utils.auth import get_current_user, get_admin_user
+from app.utils.pagination import apply_keyset, encode_cursor
+from app.utils.cache import invalidate_products
+from app.utils.idempotency import request_hash, claim_key, complete_key, release_key, replay
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+ORDER_THUMBNAIL_SIZE = 160
+
+# Per-order aggregates for the summary view, evaluated inside the list query
+ORDER_ITEM_COUNT = (
+    select(func.coalesce(func.sum(OrderItem.quantity), 0))
+    .where(OrderItem.order_id == Order.id)
+    .correlate(Order)
+    .scalar_subquery()
+)
+ORDER_FIRST_IMAGE = (
+    select(OrderItem.product_image)
+    .where(OrderItem.order_id == Order.id)
+    .order_by(OrderItem.id)
+    .limit(1)
+    .correlate(Order)
+    .scalar_subquery()
+)
+
 
 def generate_order_number() -> str:
     """Generate unique order number"""
     return f"DCF-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
 
 
+def order_thumbnail(image: Optional[str]) -> Optional[str]:
+    """Small resized URL for an uploaded image (other URLs pass through)"""
+    if not image or not image.startswith("/uploads/"):
+        return image
+    path = image.removeprefix("/uploads/")
+    return f"/uploads/resize/{ORDER_THUMBNAIL_SIZE}x{ORDER_THUMBNAIL_SIZE}/{path}"
+
+
+async def fetch_orders(db: AsyncSession, query, view: str) -> list:
+    """Run a paged order query in one round trip per view
+    
+    The full view loads all items with one extra IN query; the summary view
+    adds the item count and first image as subqueries and loads no items.
+    """
+    if view == "summary":
+        rows = await db.execute(
+            query.add_columns(ORDER_ITEM_COUNT.label("item_count"), ORDER_FIRST_IMAGE.label("first_image"))
+        )
+        return [
+            OrderSummary(
+                id=order.id,
+                order_number=order.order_number,
+                customer_id=order.customer_id,
+                customer_name=order.customer_name,
+                customer_phone=order.customer_phone,
+                total=order.total,
+                status=order.status,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+                item_count=item_count,
+                thumbnail=order_thumbnail(first_image),
+            )
+            for order, item_count, first_image in rows
+        ]
+    return (await db.scalars(query.options(selectinload(Order.items)))).all()
+
+
+async def get_order_with_relations(db: AsyncSession, order_id: int) -> Optional[Order]:
+    """Load an order with its items and timeline (async sessions cannot lazy load)"""
+    return await db.scalar(
+        select(Order)
+        .where(Order.id == order_id)
+        .options(selectinload(Order.items), selectinload(Order.timeline))
+        .execution_options(populate_existing=True)
+    )
+
+
+def insufficient_stock(product_name: str, available: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Insufficient stock for {product_name}. Available: {available}"
+    )
+
+
+async def reserve_stock(db: AsyncSession, quantities: dict[int, int]) -> Optional[int]:
+    """Take stock for each product, but only where enough is left
+    
+    Each decrement is a single conditional UPDATE, so the check and the write
+    cannot interleave with another order. Products are updated in id order
+    so concurrent orders lock rows in the same order. Returns the id of the
+    first product that is short (the caller must roll back), or None.
+    """
+    now = datetime.utcnow()
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock >= quantity)
+            .values(stock=Product.stock - quantity, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return product_id
+    return None
+
+
+async def restore_stock(db: AsyncSession, order_ids: list[int]) -> list[int]:
+    """Put the items of these orders back in stock; return the product ids
+    
+    One UPDATE ... FROM over the summed order items, so each product is
+    incremented once and in place, without reading stock first.
+    """
+    if not order_ids:
+        return []
+    restored = (
+        select(OrderItem.product_id, func.sum(OrderItem.quantity).label("quantity"))
+        .where(OrderItem.order_id.in_(order_ids))
+        .group_by(OrderItem.product_id)
+        .subquery()
+    )
+    result = await db.execute(
+        update(Product)
+        .where(Product.id == restored.c.product_id)
+        .values(stock=Product.stock + restored.c.quantity, updated_at=datetime.utcnow())
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+
+async def transition_orders(
+    db: AsyncSession,
+    old_statuses: dict[int, OrderStatus],
+    new_status: OrderStatus,
+    note: Optional[str],
+    created_by: str
+) -> tuple[list[int], list[int]]:
+    """Move orders from the status they were read with to new_status
+    
+    The UPDATE only matches orders still in the status the caller saw, so
+    when two requests transition the same order only one of them applies
+    (and only that one restores stock on cancellation). Cancelled orders
+    are never reopened, since their stock has already been returned. Adds a
+    timeline entry per changed order. Returns the changed order ids and the
+    ids of products whose stock was restored.
+    """
+    by_status: dict[OrderStatus, list[int]] = {}
+    for order_id, old_status in old_statuses.items():
+        if old_status == OrderStatus.CANCELLED and new_status != OrderStatus.CANCELLED:
+            continue
+        by_status.setdefault(old_status, []).append(order_id)
+    if not by_status:
+        return [], []
+    
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Order)
+        .where(or_(*(
+            and_(Order.id.in_(order_ids), Order.status == old_status)
+            for old_status, order_ids in by_status.items()
+        )))
+        .values(status=new_status, updated_at=now)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed = sorted(result.scalars())
+    if not changed:
+        return [], []
+    
+    await db.execute(insert(OrderTimeline), [
+        {
+            "order_id": order_id,
+            "status": new_status,
+            "note": note or f"Status changed from {old_statuses[order_id].value} to {new_status.value}",
+            "created_by": created_by,
+            "created_at": now
+        }
+        for order_id in changed
+    ])
+    
+    restored_products = []
+    if new_status == OrderStatus.CANCELLED:
+        restored_products = await restore_stock(
+            db, [order_id for order_id in changed if old_statuses[order_id] != OrderStatus.CANCELLED]
+        )
+    return changed, restored_products
+
+
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Create a new order"""
+    """Create a new order
+    
+    Send an Idempotency-Key header to make retries safe: a repeat with the
+    same key returns the first response without placing another order, and
+    a repeat arriving while the first is still running waits for it.
+    """
+    if idempotency_key is None:
+        return await place_order(db, order_data, current_user)
+    
+    fingerprint = request_hash(order_data.model_dump(mode="json"))
+    record = await claim_key(db, current_user.id, idempotency_key, fingerprint)
+    if record is not None:
+        return replay(record)
+    try:
+        return await place_order(db, order_data, current_user, idempotency_key)
+    except Exception:
+        await release_key(db, current_user.id, idempotency_key)
+        raise
+
+
+async def place_order(
+    db: AsyncSession,
+    order_data: OrderCreate,
+    current_user: User,
+    idempotency_key: Optional[str] = None
+) -> dict:
+    """Validate, reserve stock and insert an order; return the response body
+    
+    Stock is reserved with one guarded UPDATE per product inside the order's
+    transaction, so concurrent checkouts can never oversell. The response is
+    stored against the idempotency key in that same transaction.
+    """
     if not order_data.items:
         raise HTTPException(status_code=400, detail="Order must have at least one item")
     
-    # Validate and calculate totals
+    # Fetch every product in one query
+    quantities: dict[int, int] = {}
+    for item in order_data.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    products = {
+        product.id: product
+        for product in await db.scalars(select(Product).where(Product.id.in_(quantities)))
+    }
+    
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if not product:
+            raise HTTPException(status_code=400, detail=f"Product {product_id} not found")
+        if product.stock < quantity:
+            raise insufficient_stock(product.name, product.stock)
+    
+    # Reserve stock; the guard re-checks it atomically in the database
+    short_product_id = await reserve_stock(db, quantities)
+    if short_product_id is not None:
+        name = products[short_product_id].name  # Rolling back expires loaded objects
+        await db.rollback()
+        available = await db.scalar(select(Product.stock).where(Product.id == short_product_id))
+        raise insufficient_stock(name, available or 0)
+    
+    # Calculate totals from the fetched prices
     subtotal = 0
     order_items = []
     
     for item in order_data.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(status_code=400, detail=f"Product {item.product_id} not found")
-        if product.stock < item.quantity:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Insufficient stock for {product.name}. Available: {product.stock}"
-            )
-        
+        product = products[item.product_id]
         line_total = product.price * item.quantity
         subtotal += line_total
         
@@ -74,9 +303,9 @@ async def create_order(
         notes=order_data.notes
     )
     db.add(order)
-    db.flush()  # Get order ID
+    await db.flush()  # Get order ID
     
-    # Create order items and update stock
+    # Create order items
     for item_data in order_items:
         product = item_data["product"]
         
@@ -90,9 +319,6 @@ async def create_order(
             color=item_data["color"]
         )
         db.add(order_item)
-        
-        # Reduce stock
-        product.stock -= item_data["quantity"]
     
     # Create initial timeline entry
     timeline = OrderTimeline(
@@ -102,57 +328,92 @@ async def create_order(
         created_by=current_user.full_name
     )
     db.add(timeline)
+    await db.flush()
     
-    db.commit()
-    db.refresh(order)
+    order = await get_order_with_relations(db, order.id)
+    body = OrderResponse.model_validate(order).model_dump(mode="json")
+    if idempotency_key is not None:
+        await complete_key(db, current_user.id, idempotency_key, status.HTTP_201_CREATED, body)
+    await db.commit()
     
-    return order
+    invalidate_products(*quantities)
+    return body
 
 
-@router.get("", response_model=OrderListResponse)
+@router.get("", response_model=Union[OrderListResponse, OrderSummaryListResponse])
 async def get_orders(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
     status: Optional[OrderStatus] = None,
     search: Optional[str] = None,
+    paginate: str = Query("page", regex="^(page|cursor)$"),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    view: str = Query("full", regex="^(full|summary)$"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get orders (customers see their own, admins see all)"""
+    """Get orders (customers see their own, admins see all)
+    
+    paginate=cursor switches to keyset pagination on created_at; pass the
+    returned next_cursor back as cursor for the next page. view=summary
+    returns an item count and thumbnail per order instead of its items.
+    """
+    response_model = OrderSummaryListResponse if view == "summary" else OrderListResponse
+    
     if current_user.role == UserRole.ADMIN:
-        query = db.query(Order)
+        query = select(Order)
     else:
-        query = db.query(Order).filter(Order.customer_id == current_user.id)
+        query = select(Order).where(Order.customer_id == current_user.id)
     
     # Apply filters
     if status:
-        query = query.filter(Order.status == status)
+        query = query.where(Order.status == status)
     if search:
-        query = query.filter(
+        query = query.where(
             (Order.order_number.ilike(f"%{search}%")) |
             (Order.customer_name.ilike(f"%{search}%")) |
             (Order.customer_phone.ilike(f"%{search}%"))
         )
     
+    if paginate == "cursor":
+        total = pages = None
+        if include_total:
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+            pages = (total + limit - 1) // limit
+        
+        # Newest first, fetching one extra row to detect a following page
+        query = apply_keyset(query, Order.created_at, Order.id, True, cursor)
+        orders = await fetch_orders(db, query.limit(limit + 1), view)
+        
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+        
+        return response_model(
+            orders=orders, total=total, page=None, pages=pages, next_cursor=next_cursor
+        )
+    
     # Order by newest first
     query = query.order_by(desc(Order.created_at))
     
     # Pagination
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
     pages = (total + limit - 1) // limit
-    orders = query.offset((page - 1) * limit).limit(limit).all()
+    orders = await fetch_orders(db, query.offset((page - 1) * limit).limit(limit), view)
     
-    return OrderListResponse(orders=orders, total=total, page=page, pages=pages)
+    return response_model(orders=orders, total=total, page=page, pages=pages)
 
 
 @router.get("/{order_id}", response_model=OrderWithTimeline)
 async def get_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get order details with timeline"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_with_relations(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -163,41 +424,93 @@ async def get_order(
     return order
 
 
+@router.put("/status", response_model=OrderBulkStatusResponse)
+async def bulk_update_order_status(
+    status_data: OrderBulkStatusUpdate,
+    admin: User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Move many orders to one status in a single transaction (Admin only)
+    
+    Orders already in the target status are left alone, and cancelled
+    orders are not reopened (see transition_orders).
+    """
+    order_ids = list(dict.fromkeys(status_data.order_ids))
+    current = {
+        order_id: old_status
+        for order_id, old_status in await db.execute(
+            select(Order.id, Order.status).where(Order.id.in_(order_ids))
+        )
+    }
+    eligible = {
+        order_id: old_status
+        for order_id, old_status in current.items()
+        if old_status != status_data.status and old_status != OrderStatus.CANCELLED
+    }
+    
+    changed, restored_products = await transition_orders(
+        db, eligible, status_data.status, status_data.note, admin.full_name
+    )
+    await db.commit()
+    
+    if restored_products:
+        invalidate_products(*restored_products)
+    
+    changed = set(changed)
+    results = []
+    for order_id in order_ids:
+        old_status = current.get(order_id)
+        if old_status is None:
+            results.append(OrderBulkStatusResult(order_id=order_id, result="not_found"))
+        elif order_id in changed:
+            results.append(OrderBulkStatusResult(order_id=order_id, result="updated", old_status=old_status))
+        elif old_status == status_data.status:
+            results.append(OrderBulkStatusResult(order_id=order_id, result="unchanged", old_status=old_status))
+        elif old_status == OrderStatus.CANCELLED:
+            results.append(OrderBulkStatusResult(
+                order_id=order_id, result="skipped", old_status=old_status,
+                detail="Cancelled orders cannot be reopened"
+            ))
+        else:
+            results.append(OrderBulkStatusResult(
+                order_id=order_id, result="skipped", old_status=old_status,
+                detail="Order status changed during the update"
+            ))
+    
+    return OrderBulkStatusResponse(results=results, updated=len(changed))
+
+
 @router.put("/{order_id}/status", response_model=OrderWithTimeline)
 async def update_order_status(
     order_id: int,
     status_data: OrderStatusUpdate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Update order status (Admin only)"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    """Update order status (Admin only)
+    
+    Cancelling restores stock once, even if the order is cancelled through
+    another request at the same time; the losing request gets a 409.
+    """
+    order = await get_order_with_relations(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    old_status = order.status
-    order.status = status_data.status
+    if order.status == OrderStatus.CANCELLED and status_data.status != OrderStatus.CANCELLED:
+        raise HTTPException(status_code=400, detail="Cancelled orders cannot be reopened")
     
-    # Create timeline entry
-    timeline = OrderTimeline(
-        order_id=order.id,
-        status=status_data.status,
-        note=status_data.note or f"Status changed from {old_status.value} to {status_data.status.value}",
-        created_by=admin.full_name
+    changed, restored_products = await transition_orders(
+        db, {order.id: order.status}, status_data.status, status_data.note, admin.full_name
     )
-    db.add(timeline)
-    
-    # If cancelled, restore stock
-    if status_data.status == OrderStatus.CANCELLED and old_status != OrderStatus.CANCELLED:
-        for item in order.items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if product:
-                product.stock += item.quantity
+    if not changed:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Order status changed during the update, please reload")
+    await db.commit()
     
-    db.commit()
-    db.refresh(order)
+    if restored_products:
+        invalidate_products(*restored_products)
     
-    return order
+    return await get_order_with_relations(db, order.id)
 
 
 @router.put("/{order_id}", response_model=OrderResponse)
@@ -205,10 +518,10 @@ async def update_order(
     order_id: int,
     order_data: OrderUpdate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update order details (Admin only)"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_with_relations(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -217,20 +530,23 @@ async def update_order(
     if order_data.delivery_address:
         order.delivery_address = order_data.delivery_address
     
-    db.commit()
-    db.refresh(order)
+    await db.commit()
     
-    return order
+    return await get_order_with_relations(db, order.id)
 
 
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_order(
     order_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Cancel an order (only if pending)"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    """Cancel an order (only if pending)
+    
+    Cancelling an already cancelled order does nothing, so stock is never
+    restored twice when this overlaps a status update to cancelled.
+    """
+    order = await get_order_with_relations(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -238,25 +554,22 @@ async def cancel_order(
     if current_user.role != UserRole.ADMIN and order.customer_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
+    if order.status == OrderStatus.CANCELLED:
+        return
+    
     # Only pending orders can be cancelled by customers
     if current_user.role != UserRole.ADMIN and order.status != OrderStatus.PENDING:
         raise HTTPException(status_code=400, detail="Only pending orders can be cancelled")
     
-    # Restore stock
-    for item in order.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock += item.quantity
-    
-    order.status = OrderStatus.CANCELLED
-    
-    # Create timeline entry
-    timeline = OrderTimeline(
-        order_id=order.id,
-        status=OrderStatus.CANCELLED,
-        note="Order cancelled",
-        created_by=current_user.full_name
+    changed, restored_products = await transition_orders(
+        db, {order.id: order.status}, OrderStatus.CANCELLED, "Order cancelled", current_user.full_name
     )
-    db.add(timeline)
+    if not changed:
+        await db.rollback()
+        current_status = await db.scalar(select(Order.status).where(Order.id == order_id))
+        if current_status == OrderStatus.CANCELLED:
+            return
+        raise HTTPException(status_code=409, detail="Order status changed during the update, please reload")
+    await db.commit()
     
-    db.commit()
+    invalidate_products(*restored_products)
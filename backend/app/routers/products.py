@@ -1,26 +1,56 @@
 """
 Dan Classic Furniture - Products Router
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request, Response
+from sqlalchemy import select, func, and_, true, case, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import Optional
+from datetime import datetime
 import re
 
+from app.config import settings
 from app.database import get_db
 from app.models.user import User
-from app.models.product import Product, Category
+from app.models.product import Product, Category, ProductColor, normalize_facet
+from app.models.order import OrderItem
 from app.schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse, ProductWithCategory,
     ProductListResponse, CategoryCreate, CategoryUpdate, CategoryResponse,
-    CategoryWithCount
+    CategoryWithCount, ProductFilter, ProductFacets, FacetValue, CategoryFacet,
+    PriceBucketFacet
 )
 from app.utils.auth import get_admin_user, get_optional_user
-from app.utils.uploads import save_multiple_files, delete_file
+from app.utils.uploads import save_multiple_files, delete_image, STORED_IMAGE_DIR, UploadRoute
+from app.utils.image_refs import (
+    register_images, retain_images, release_images, delete_released_images, reference_diff
+)
+from app.utils.pagination import apply_keyset, encode_cursor
+from app.utils.search import apply_product_search, order_by_relevance
+from app.utils.cache import (
+    catalog_cache, product_tag, category_tag, CATEGORIES_TAG, PRODUCT_LISTS_TAG, FACETS_TAG
+)
+from app.utils.conditional import make_etag, is_not_modified, not_modified, set_validators
 
 router = APIRouter(prefix="/products", tags=["Products"])
+upload_router = APIRouter(route_class=UploadRoute)  # included into router below
 categories_router = APIRouter(prefix="/categories", tags=["Categories"])
 
+# Sort option -> (column, descending)
+PRODUCT_SORTS = {
+    "newest": (Product.created_at, True),
+    "oldest": (Product.created_at, False),
+    "price_low": (Product.price, False),
+    "price_high": (Product.price, True),
+    "name": (Product.name, False),
+}
+
+# Everything a serialized product depends on, used for ETags
+PRODUCT_SIGNATURE_COLUMNS = (
+    Product.id, Product.updated_at,
+    Category.id, Category.name, Category.slug, Category.description, Category.image
+)
+
 
 # ============== Helper Functions ==============
 
@@ -32,18 +62,178 @@ def slugify(text: str) -> str:
     return text
 
 
-# ============== Category Endpoints ==============
+def serialize_product(product: Product) -> ProductWithCategory:
+    """Build a product response from a product loaded with its category"""
+    category = product.category
+    return ProductWithCategory(
+        id=product.id,
+        name=product.name,
+        description=product.description,
+        price=product.price,
+        compare_price=product.compare_price,
+        category_id=product.category_id,
+        stock=product.stock,
+        sku=product.sku,
+        dimensions=product.dimensions,
+        material=product.material,
+        colors=product.colors or [],
+        images=product.images or [],
+        image_variants=product.image_variants or {},
+        image_placeholders=product.image_placeholders or {},
+        featured=product.featured,
+        is_active=product.is_active,
+        created_at=product.created_at,
+        updated_at=product.updated_at,
+        category=CategoryResponse.model_validate(category) if category else None
+    )
 
-@categories_router.get("", response_model=list[CategoryWithCount])
-async def get_categories(db: Session = Depends(get_db)):
-    """Get all categories with product counts"""
-    categories = db.query(Category).all()
-    result = []
-    for cat in categories:
-        count = db.query(Product).filter(
-            Product.category_id == cat.id,
+
+def product_signature(product: ProductWithCategory) -> tuple:
+    """Signature of a serialized product, matching PRODUCT_SIGNATURE_COLUMNS"""
+    category = product.category
+    if category is None:
+        return (product.id, product.updated_at, None, None, None, None, None)
+    return (
+        product.id, product.updated_at,
+        category.id, category.name, category.slug, category.description, category.image
+    )
+
+
+def signature_query(query):
+    """Turn a product query into a lightweight probe of its signatures"""
+    return query.with_only_columns(*PRODUCT_SIGNATURE_COLUMNS).outerjoin(
+        Category, Category.id == Product.category_id
+    )
+
+
+def catalog_validators(signatures: list[tuple], *extra) -> tuple[str, Optional[datetime]]:
+    """ETag and Last-Modified for a set of product signatures"""
+    last_modified = max((sig[1] for sig in signatures if sig[1] is not None), default=None)
+    return make_etag([*extra, *signatures]), last_modified
+
+
+def list_etag(signatures: list[tuple], *extra) -> str:
+    """ETag for a product list
+    
+    Lists carry no Last-Modified: their newest updated_at stays the same
+    when a product leaves the list, so If-Modified-Since would keep
+    answering 304 with the old list.
+    """
+    return make_etag([*extra, *signatures])
+
+
+async def serve_product_list(key: tuple, query, request: Request, response: Response, db: AsyncSession):
+    """Serve a cached product list, answering conditional requests with 304"""
+    cached = catalog_cache.get(key)
+    if cached is None:
+        generation = catalog_cache.generation()
+        # Cheap freshness probe before loading and serializing the products
+        rows = (await db.execute(signature_query(query))).all()
+        etag = list_etag([tuple(row) for row in rows])
+        if is_not_modified(request, etag, None):
+            return not_modified(etag, None)
+        
+        products = (await db.scalars(query.options(joinedload(Product.category)))).all()
+        result = [serialize_product(product) for product in products]
+        cached = (result, list_etag([product_signature(p) for p in result]))
+        catalog_cache.set(key, cached, tags=product_list_tags(products), since=generation)
+    
+    result, etag = cached
+    if is_not_modified(request, etag, None):
+        return not_modified(etag, None)
+    set_validators(response, etag, None)
+    return result
+
+
+def set_image_details(product: Product, details: dict[str, dict]) -> None:
+    """Record variants and placeholders of product.images, dropping detached images
+    
+    details maps image paths to {"variants", "placeholder"}, as returned by
+    retain_images or save_multiple_files, and extends what is already recorded.
+    """
+    images = product.images or []
+    variants = {
+        **(product.image_variants or {}),
+        **{path: detail["variants"] for path, detail in details.items() if detail.get("variants")},
+    }
+    placeholders = {
+        **(product.image_placeholders or {}),
+        **{path: detail["placeholder"] for path, detail in details.items() if detail.get("placeholder")},
+    }
+    product.image_variants = {path: variants[path] for path in images if path in variants}
+    product.image_placeholders = {path: placeholders[path] for path in images if path in placeholders}
+
+
+async def sync_product_colors(db: AsyncSession, product: Product) -> None:
+    """Rewrite the product_colors rows for a product from Product.colors"""
+    await db.execute(delete(ProductColor).where(ProductColor.product_id == product.id))
+    colors = {normalize_facet(color) for color in (product.colors or [])} - {None}
+    if colors:
+        await db.execute(insert(ProductColor), [
+            {"product_id": product.id, "color": color} for color in sorted(colors)
+        ])
+
+
+def product_filter_clauses(filters: ProductFilter) -> dict:
+    """Where-clauses for the product filters, keyed by the facet they filter"""
+    clauses = {}
+    if filters.category_id:
+        clauses["category"] = Product.category_id == filters.category_id
+    if filters.min_price is not None or filters.max_price is not None:
+        clauses["price"] = and_(
+            Product.price >= filters.min_price if filters.min_price is not None else true(),
+            Product.price <= filters.max_price if filters.max_price is not None else true()
+        )
+    if filters.material:
+        clauses["material"] = Product.material_key == normalize_facet(filters.material)
+    if filters.color:
+        clauses["color"] = Product.id.in_(
+            select(ProductColor.product_id).where(ProductColor.color == normalize_facet(filters.color))
+        )
+    if filters.featured is not None:
+        clauses["featured"] = Product.featured == filters.featured
+    if filters.in_stock:
+        clauses["in_stock"] = Product.stock > 0
+    return clauses
+
+
+def filter_products(query, filters: ProductFilter, dialect: str, exclude: tuple = ()):
+    """Apply the active-product, filter and search conditions to a query
+    
+    Returns the query and whether it can be ordered by search relevance.
+    Facets named in exclude are left unfiltered.
+    """
+    clauses = product_filter_clauses(filters)
+    query = query.where(
+        Product.is_active == True,
+        *(clause for facet, clause in clauses.items() if facet not in exclude)
+    )
+    if filters.search:
+        return apply_product_search(query, filters.search, dialect)
+    return query, False
+
+
+def product_list_tags(products: list[Product]) -> set[str]:
+    """Cache tags for a cached list of products"""
+    tags = {PRODUCT_LISTS_TAG}
+    for product in products:
+        tags.add(product_tag(product.id))
+        tags.add(category_tag(product.category_id))
+    return tags
+
+
+async def load_categories(db: AsyncSession) -> tuple[list[CategoryWithCount], str]:
+    """Categories with active product counts, plus their ETag"""
+    rows = (await db.execute(
+        select(Category, func.count(Product.id))
+        .outerjoin(Product, and_(
+            Product.category_id == Category.id,
             Product.is_active == True
-        ).count()
+        ))
+        .group_by(Category.id)
+    )).all()
+    result = []
+    for cat, count in rows:
         result.append(CategoryWithCount(
             id=cat.id,
             name=cat.name,
@@ -53,13 +243,36 @@ async def get_categories(db: Session = Depends(get_db)):
             created_at=cat.created_at,
             product_count=count
         ))
+    
+    # Categories have no updated_at, so the ETag covers every served field
+    etag = make_etag(
+        (c.id, c.name, c.slug, c.description, c.image, c.product_count) for c in result
+    )
+    return result, etag
+
+
+# ============== Category Endpoints ==============
+
+@categories_router.get("", response_model=list[CategoryWithCount])
+async def get_categories(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get all categories with product counts"""
+    cached = catalog_cache.get(("categories",))
+    if cached is None:
+        generation = catalog_cache.generation()
+        cached = await load_categories(db)
+        catalog_cache.set(("categories",), cached, tags={CATEGORIES_TAG}, since=generation)
+    
+    result, etag = cached
+    if is_not_modified(request, etag, None):
+        return not_modified(etag, None)
+    set_validators(response, etag, None)
     return result
 
 
 @categories_router.get("/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: int, db: Session = Depends(get_db)):
+async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
     """Get category by ID"""
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.scalar(select(Category).where(Category.id == category_id))
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     return category
@@ -69,11 +282,11 @@ async def get_category(category_id: int, db: Session = Depends(get_db)):
 async def create_category(
     category_data: CategoryCreate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new category (Admin only)"""
     # Check if name exists
-    if db.query(Category).filter(Category.name == category_data.name).first():
+    if await db.scalar(select(Category).where(Category.name == category_data.name)):
         raise HTTPException(status_code=400, detail="Category name already exists")
     
     slug = slugify(category_data.name)
@@ -84,8 +297,10 @@ async def create_category(
         description=category_data.description
     )
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
+    
+    catalog_cache.invalidate_tags(CATEGORIES_TAG)
     return category
 
 
@@ -94,10 +309,10 @@ async def update_category(
     category_id: int,
     category_data: CategoryUpdate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a category (Admin only)"""
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.scalar(select(Category).where(Category.id == category_id))
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
@@ -106,11 +321,17 @@ async def update_category(
         category.slug = slugify(category_data.name)
     if category_data.description is not None:
         category.description = category_data.description
-    if category_data.image is not None:
+    released = []
+    if category_data.image is not None and category_data.image != category.image:
+        await retain_images(db, [category_data.image])
+        released = await release_images(db, [category.image])
         category.image = category_data.image
     
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
+    delete_released_images(released)
+    
+    catalog_cache.invalidate_tags(CATEGORIES_TAG, category_tag(category_id))
     return category
 
 
@@ -118,246 +339,272 @@ async def update_category(
 async def delete_category(
     category_id: int,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a category (Admin only)"""
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.scalar(select(Category).where(Category.id == category_id))
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
     # Check if category has products
-    if db.query(Product).filter(Product.category_id == category_id).count() > 0:
+    if await db.scalar(select(func.count(Product.id)).where(Product.category_id == category_id)) > 0:
         raise HTTPException(status_code=400, detail="Cannot delete category with products")
     
-    db.delete(category)
-    db.commit()
+    released = await release_images(db, [category.image])
+    await db.delete(category)
+    await db.commit()
+    delete_released_images(released)
+    
+    catalog_cache.invalidate_tags(CATEGORIES_TAG)
 
 
 # ============== Product Endpoints ==============
 
 @router.get("", response_model=ProductListResponse)
 async def get_products(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     limit: int = Query(12, ge=1, le=50),
-    category_id: Optional[int] = None,
-    min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    material: Optional[str] = None,
-    color: Optional[str] = None,
-    featured: Optional[bool] = None,
-    in_stock: Optional[bool] = None,
-    search: Optional[str] = None,
-    sort: Optional[str] = Query("newest", regex="^(newest|oldest|price_low|price_high|name)$"),
-    db: Session = Depends(get_db)
+    filters: ProductFilter = Depends(),
+    sort: Optional[str] = Query(None, regex="^(relevance|newest|oldest|price_low|price_high|name)$"),
+    paginate: str = Query("page", regex="^(page|cursor)$"),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get products with filters and pagination"""
-    query = db.query(Product).filter(Product.is_active == True)
-    
-    # Apply filters
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
-    if material:
-        query = query.filter(Product.material.ilike(f"%{material}%"))
-    if color:
-        query = query.filter(Product.colors.contains([color]))
-    if featured is not None:
-        query = query.filter(Product.featured == featured)
-    if in_stock:
-        query = query.filter(Product.stock > 0)
-    if search:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f"%{search}%"),
-                Product.description.ilike(f"%{search}%")
-            )
-        )
+    """Get products with filters and pagination
     
-    # Sorting
-    if sort == "newest":
-        query = query.order_by(Product.created_at.desc())
-    elif sort == "oldest":
-        query = query.order_by(Product.created_at.asc())
-    elif sort == "price_low":
-        query = query.order_by(Product.price.asc())
-    elif sort == "price_high":
-        query = query.order_by(Product.price.desc())
-    elif sort == "name":
-        query = query.order_by(Product.name.asc())
-    
-    # Pagination
-    total = query.count()
-    pages = (total + limit - 1) // limit
-    products = query.offset((page - 1) * limit).limit(limit).all()
-    
-    # Include category info
-    result = []
-    for product in products:
-        category = db.query(Category).filter(Category.id == product.category_id).first()
-        result.append(ProductWithCategory(
-            id=product.id,
-            name=product.name,
-            description=product.description,
-            price=product.price,
-            compare_price=product.compare_price,
-            category_id=product.category_id,
-            stock=product.stock,
-            sku=product.sku,
-            dimensions=product.dimensions,
-            material=product.material,
-            colors=product.colors or [],
-            images=product.images or [],
-            featured=product.featured,
-            is_active=product.is_active,
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-            category=CategoryResponse(
-                id=category.id,
-                name=category.name,
-                slug=category.slug,
-                description=category.description,
-                image=category.image,
-                created_at=category.created_at
-            ) if category else None
-        ))
+    paginate=cursor switches to keyset pagination: pass the returned
+    next_cursor back as cursor to get the following page. The total count
+    is skipped in that mode unless include_total is set.
+    
+    Searches are ranked by relevance unless another sort is requested.
+    """
+    dialect = db.bind.dialect.name
+    query, ranked = filter_products(select(Product), filters, dialect)
+    
+    if sort is None:
+        sort = "relevance" if ranked else "newest"
+    if sort == "relevance" and (not ranked or paginate == "cursor"):
+        # Relevance is not a stable keyset column, so cursors use newest
+        sort = "newest"
     
-    return ProductListResponse(products=result, total=total, page=page, pages=pages)
+    if sort != "relevance":
+        sort_column, descending = PRODUCT_SORTS[sort]
+    
+    if paginate == "cursor":
+        total = pages = None
+        if include_total:
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+            pages = (total + limit - 1) // limit
+        
+        # Fetch one extra row to know whether another page follows
+        page_query = apply_keyset(query, sort_column, Product.id, descending, cursor).limit(limit + 1)
+    else:
+        # Pagination; the count needs no ordering or ranking
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        pages = (total + limit - 1) // limit
+        
+        # Sorting
+        if sort == "relevance":
+            query = order_by_relevance(query, filters.search, dialect).order_by(Product.id.desc())
+        else:
+            query = query.order_by(sort_column.desc() if descending else sort_column.asc())
+        page_query = query.offset((page - 1) * limit).limit(limit)
+    
+    # Cheap freshness probe before loading and serializing the page
+    rows = (await db.execute(signature_query(page_query))).all()
+    etag = list_etag([tuple(row) for row in rows], total)
+    if is_not_modified(request, etag, None):
+        return not_modified(etag, None)
+    
+    # Include category info in the same round trip
+    products = (await db.scalars(page_query.options(joinedload(Product.category)))).all()
+    
+    next_cursor = None
+    if paginate == "cursor" and len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    
+    set_validators(response, etag, None)
+    result = [serialize_product(product) for product in products]
+    return ProductListResponse(
+        products=result,
+        total=total,
+        page=page if paginate == "page" else None,
+        pages=pages,
+        next_cursor=next_cursor
+    )
 
 
 @router.get("/featured", response_model=list[ProductWithCategory])
 async def get_featured_products(
+    request: Request,
+    response: Response,
     limit: int = Query(8, ge=1, le=20),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get featured products"""
-    products = db.query(Product).filter(
+    query = select(Product).where(
         Product.is_active == True,
         Product.featured == True
-    ).order_by(Product.created_at.desc()).limit(limit).all()
+    ).order_by(Product.created_at.desc()).limit(limit)
     
-    result = []
-    for product in products:
-        category = db.query(Category).filter(Category.id == product.category_id).first()
-        result.append(ProductWithCategory(
-            id=product.id,
-            name=product.name,
-            description=product.description,
-            price=product.price,
-            compare_price=product.compare_price,
-            category_id=product.category_id,
-            stock=product.stock,
-            sku=product.sku,
-            dimensions=product.dimensions,
-            material=product.material,
-            colors=product.colors or [],
-            images=product.images or [],
-            featured=product.featured,
-            is_active=product.is_active,
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-            category=CategoryResponse(
-                id=category.id,
-                name=category.name,
-                slug=category.slug,
-                description=category.description,
-                image=category.image,
-                created_at=category.created_at
-            ) if category else None
-        ))
-    return result
+    return await serve_product_list(("featured", limit), query, request, response, db)
 
 
 @router.get("/new-arrivals", response_model=list[ProductWithCategory])
 async def get_new_arrivals(
+    request: Request,
+    response: Response,
     limit: int = Query(8, ge=1, le=20),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get newest products"""
-    products = db.query(Product).filter(
+    query = select(Product).where(
         Product.is_active == True
-    ).order_by(Product.created_at.desc()).limit(limit).all()
+    ).order_by(Product.created_at.desc()).limit(limit)
     
-    result = []
-    for product in products:
-        category = db.query(Category).filter(Category.id == product.category_id).first()
-        result.append(ProductWithCategory(
-            id=product.id,
-            name=product.name,
-            description=product.description,
-            price=product.price,
-            compare_price=product.compare_price,
-            category_id=product.category_id,
-            stock=product.stock,
-            sku=product.sku,
-            dimensions=product.dimensions,
-            material=product.material,
-            colors=product.colors or [],
-            images=product.images or [],
-            featured=product.featured,
-            is_active=product.is_active,
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-            category=CategoryResponse(
-                id=category.id,
-                name=category.name,
-                slug=category.slug,
-                description=category.description,
-                image=category.image,
-                created_at=category.created_at
-            ) if category else None
-        ))
+    return await serve_product_list(("new-arrivals", limit), query, request, response, db)
+
+
+@router.get("/facets", response_model=ProductFacets)
+async def get_product_facets(
+    filters: ProductFilter = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get sidebar filter counts for the current filter set
+    
+    Each facet is counted with every filter except its own applied, so the
+    sidebar can show what selecting another value would return.
+    """
+    key = ("facets",) + tuple(
+        normalize_facet(value) if isinstance(value, str) else value
+        for value in filters.model_dump().values()
+    )
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    generation = catalog_cache.generation()
+    dialect = db.bind.dialect.name
+    
+    def counting(*columns, exclude: str):
+        query, _ = filter_products(select(*columns), filters, dialect, exclude=(exclude,))
+        return query
+    
+    # One aggregate query per facet
+    category_rows = (await db.execute(
+        counting(Category.id, Category.name, Category.slug, func.count(Product.id), exclude="category")
+        .join(Category, Category.id == Product.category_id)
+        .group_by(Category.id, Category.name, Category.slug)
+        .order_by(Category.name)
+    )).all()
+    material_rows = (await db.execute(
+        counting(Product.material_key, func.count(Product.id), exclude="material")
+        .where(Product.material_key.is_not(None))
+        .group_by(Product.material_key)
+        .order_by(Product.material_key)
+    )).all()
+    color_rows = (await db.execute(
+        counting(ProductColor.color, func.count(Product.id), exclude="color")
+        .join(ProductColor, ProductColor.product_id == Product.id)
+        .group_by(ProductColor.color)
+        .order_by(ProductColor.color)
+    )).all()
+    stock_row = (await db.execute(
+        counting(func.count(Product.id), func.sum(case((Product.stock > 0, 1), else_=0)), exclude="in_stock")
+    )).one()
+    
+    boundaries = sorted(settings.PRICE_BUCKETS)
+    bucket = case(
+        *((Product.price < upper, index) for index, upper in enumerate(boundaries)),
+        else_=len(boundaries)
+    ).label("bucket")
+    bucket_counts = dict((await db.execute(
+        counting(bucket, func.count(Product.id), exclude="price").group_by(bucket)
+    )).all())
+    
+    lowers = [0.0] + boundaries
+    uppers = boundaries + [None]
+    all_count, in_stock_count = stock_row[0], stock_row[1] or 0
+    
+    result = ProductFacets(
+        total=in_stock_count if filters.in_stock else all_count,
+        in_stock=in_stock_count,
+        categories=[
+            CategoryFacet(id=cid, name=name, slug=slug, count=count)
+            for cid, name, slug, count in category_rows
+        ],
+        materials=[
+            FacetValue(value=value, label=value.title(), count=count)
+            for value, count in material_rows
+        ],
+        colors=[
+            FacetValue(value=value, label=value.title(), count=count)
+            for value, count in color_rows
+        ],
+        price_buckets=[
+            PriceBucketFacet(min_price=lowers[i], max_price=uppers[i], count=bucket_counts.get(i, 0))
+            for i in range(len(lowers))
+        ]
+    )
+    catalog_cache.set(key, result, tags={FACETS_TAG, PRODUCT_LISTS_TAG, CATEGORIES_TAG}, since=generation)
     return result
 
 
 @router.get("/{product_id}", response_model=ProductWithCategory)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(
+    product_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
     """Get product by ID"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    category = db.query(Category).filter(Category.id == product.category_id).first()
+    cached = catalog_cache.get(("product", product_id))
+    if cached is None:
+        generation = catalog_cache.generation()
+        query = select(Product).where(Product.id == product_id)
+        
+        # Cheap freshness probe before loading and serializing the product
+        row = (await db.execute(signature_query(query))).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        etag, last_modified = catalog_validators([tuple(row)])
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        
+        product = await db.scalar(query.options(joinedload(Product.category)))
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        result = serialize_product(product)
+        etag, last_modified = catalog_validators([product_signature(result)])
+        cached = (result, etag, last_modified)
+        catalog_cache.set(
+            ("product", product_id), cached,
+            tags={product_tag(product.id), category_tag(product.category_id)},
+            since=generation
+        )
     
-    return ProductWithCategory(
-        id=product.id,
-        name=product.name,
-        description=product.description,
-        price=product.price,
-        compare_price=product.compare_price,
-        category_id=product.category_id,
-        stock=product.stock,
-        sku=product.sku,
-        dimensions=product.dimensions,
-        material=product.material,
-        colors=product.colors or [],
-        images=product.images or [],
-        featured=product.featured,
-        is_active=product.is_active,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        category=CategoryResponse(
-            id=category.id,
-            name=category.name,
-            slug=category.slug,
-            description=category.description,
-            image=category.image,
-            created_at=category.created_at
-        ) if category else None
-    )
+    result, etag, last_modified = cached
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    return result
 
 
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product_data: ProductCreate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new product (Admin only)"""
     # Verify category exists
-    if not db.query(Category).filter(Category.id == product_data.category_id).first():
+    if not await db.scalar(select(Category).where(Category.id == product_data.category_id)):
         raise HTTPException(status_code=400, detail="Category not found")
     
     product = Product(
@@ -374,55 +621,83 @@ async def create_product(
         images=product_data.images,
         featured=product_data.featured
     )
+    set_image_details(product, await retain_images(db, product_data.images))
     db.add(product)
-    db.commit()
-    db.refresh(product)
+    await db.flush()
+    await sync_product_colors(db, product)
+    await db.commit()
+    await db.refresh(product)
+    
+    catalog_cache.invalidate_tags(CATEGORIES_TAG, PRODUCT_LISTS_TAG)
     return product
 
 
-@router.post("/{product_id}/images", response_model=ProductResponse)
+@upload_router.post("/{product_id}/images", response_model=ProductResponse)
 async def upload_product_images(
     product_id: int,
     files: list[UploadFile] = File(...),
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upload images for a product (Admin only)"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Save uploaded files
-    new_paths = await save_multiple_files(files, f"products/{product_id}")
+    uploaded = await save_multiple_files(files)
+    await register_images(db, uploaded)
+    new_paths = [image["path"] for image in uploaded]
+    details = await retain_images(db, new_paths)
     
-    # Add to existing images
+    # Add to existing images, recording each one's variants and placeholder
     current_images = product.images or []
     product.images = current_images + new_paths
+    set_image_details(product, details)
+    
+    await db.commit()
+    await db.refresh(product)
     
-    db.commit()
-    db.refresh(product)
+    catalog_cache.invalidate_tags(product_tag(product_id))
     return product
 
 
+router.include_router(upload_router)
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: int,
     product_data: ProductUpdate,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a product (Admin only)"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Update fields
     update_data = product_data.model_dump(exclude_unset=True)
+    released = []
+    details = {}
+    if "images" in update_data:
+        added, removed = reference_diff(product.images, update_data["images"])
+        details = await retain_images(db, added)
+        released = await release_images(db, removed)
     for field, value in update_data.items():
         setattr(product, field, value)
+    if "images" in update_data:
+        set_image_details(product, details)
+    if "colors" in update_data:
+        await sync_product_colors(db, product)
     
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+    await db.refresh(product)
+    delete_released_images(released)
+    
+    # Featured/active/category changes can move the product between lists
+    catalog_cache.invalidate_tags(product_tag(product_id), PRODUCT_LISTS_TAG, CATEGORIES_TAG)
     return product
 
 
@@ -430,16 +705,33 @@ async def update_product(
 async def delete_product(
     product_id: int,
     admin: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a product (Admin only)"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.id == product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Delete associated images
-    for image_path in (product.images or []):
-        delete_file(image_path)
+    # Stored images are shared, so only release them; older uploads belong
+    # to this product alone, unless past orders still show them
+    images = product.images or []
+    released = await release_images(db, images)
+    ordered = set(await db.scalars(
+        select(OrderItem.product_image).where(OrderItem.product_image.in_(images))
+    )) if images else set()
+    variants = product.image_variants or {}
+    legacy = [
+        (image_path, variants.get(image_path))
+        for image_path in images
+        if not image_path.startswith(f"/uploads/{STORED_IMAGE_DIR}/") and image_path not in ordered
+    ]
+    
+    await db.execute(delete(ProductColor).where(ProductColor.product_id == product_id))
+    await db.delete(product)
+    await db.commit()
+    delete_released_images(released)
+    for image_path, image_variants in legacy:
+        delete_image(image_path, image_variants)
     
-    db.delete(product)
-    db.commit()
+    catalog_cache.invalidate_tags(product_tag(product_id), PRODUCT_LISTS_TAG, CATEGORIES_TAG)
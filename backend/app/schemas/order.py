@@ -60,6 +60,24 @@ class OrderStatusUpdate(BaseModel):
     note: Optional[str] = None
 
 
+class OrderBulkStatusUpdate(BaseModel):
+    order_ids: list[int] = Field(..., min_length=1, max_length=200)
+    status: OrderStatus
+    note: Optional[str] = None
+
+
+class OrderBulkStatusResult(BaseModel):
+    order_id: int
+    result: str  # "updated", "unchanged", "skipped" or "not_found"
+    old_status: Optional[OrderStatus] = None
+    detail: Optional[str] = None
+
+
+class OrderBulkStatusResponse(BaseModel):
+    results: list[OrderBulkStatusResult]
+    updated: int
+
+
 class OrderResponse(BaseModel):
     id: int
     order_number: str
@@ -87,9 +105,33 @@ class OrderWithTimeline(OrderResponse):
 
 class OrderListResponse(BaseModel):
     orders: list[OrderResponse]
-    total: int
-    page: int
-    pages: int
+    total: Optional[int] = None
+    page: Optional[int] = None
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class OrderSummary(BaseModel):
+    """Order without its items, for list pages"""
+    id: int
+    order_number: str
+    customer_id: int
+    customer_name: str
+    customer_phone: str
+    total: float
+    status: OrderStatus
+    created_at: datetime
+    updated_at: datetime
+    item_count: int = 0  # units across all items
+    thumbnail: Optional[str] = None  # first item's image, small
+
+
+class OrderSummaryListResponse(BaseModel):
+    orders: list[OrderSummary]
+    total: Optional[int] = None
+    page: Optional[int] = None
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # ============== Dashboard Stats Schemas ==============
@@ -1,7 +1,7 @@
 """
 Dan Classic Furniture - Product Schemas
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
 
@@ -73,13 +73,28 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class ImageVariant(BaseModel):
+    width: int
+    jpeg: str
+    webp: str
+
+
 class ProductResponse(ProductBase):
     id: int
     images: list[str] = []
+    # image path -> {"thumb" | "medium" | "large": ImageVariant}, for srcset
+    image_variants: dict[str, dict[str, ImageVariant]] = {}
+    # image path -> tiny data URI preview, shown until the image loads
+    image_placeholders: dict[str, str] = {}
     is_active: bool
     created_at: datetime
     updated_at: datetime
     
+    @field_validator('image_variants', 'image_placeholders', mode='before')
+    @classmethod
+    def default_image_maps(cls, v):
+        return v or {}
+    
     class Config:
         from_attributes = True
 
@@ -90,9 +105,10 @@ class ProductWithCategory(ProductResponse):
 
 class ProductListResponse(BaseModel):
     products: list[ProductWithCategory]
-    total: int
-    page: int
-    pages: int
+    total: Optional[int] = None
+    page: Optional[int] = None
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # ============== Filter Schemas ==============
@@ -106,3 +122,33 @@ class ProductFilter(BaseModel):
     featured: Optional[bool] = None
     in_stock: Optional[bool] = None
     search: Optional[str] = None
+
+
+# ============== Facet Schemas ==============
+
+class FacetValue(BaseModel):
+    value: str
+    label: str
+    count: int
+
+
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    slug: str
+    count: int
+
+
+class PriceBucketFacet(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    in_stock: int
+    categories: list[CategoryFacet]
+    materials: list[FacetValue]
+    colors: list[FacetValue]
+    price_buckets: list[PriceBucketFacet]
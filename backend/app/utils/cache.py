@@ -0,0 +1,140 @@
+"""
+Dan Classic Furniture - In-Process Catalog Cache
+A bounded LRU cache with TTL expiry and tag-based invalidation. Each worker
+process keeps its own copy, so the TTL bounds staleness across workers.
+
+A request that misses reads the database and then stores the result. If a
+write invalidates the same tags in between, storing would put the value it
+read before the write back into the cache, so callers take
+cache.generation() before reading and pass it as set(..., since=...); the
+value is dropped if any of its tags was invalidated after that point.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+from app.config import settings
+
+
+class TTLCache:
+    """LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags: dict[str, set] = {}  # tag -> keys
+        self._generation = 0
+        self._invalidated_at: dict[str, int] = {}  # tag -> generation of its last invalidation
+        self._cleared_at = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+
+    def generation(self) -> int:
+        """Current invalidation generation, to pass to set() as since"""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), since: Optional[int] = None) -> None:
+        """Store a value, tagged for later invalidation
+        
+        since is the generation() taken before the value was read; the value
+        is not stored if any of its tags has been invalidated after it.
+        """
+        tags = frozenset(tags)
+        if since is not None and (
+            self._cleared_at > since
+            or any(self._invalidated_at.get(tag, 0) > since for tag in tags)
+        ):
+            self.stale_sets += 1
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """Drop every entry carrying any of the given tags"""
+        self._generation += 1
+        for tag in tags:
+            self._invalidated_at[tag] = self._generation
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._invalidated_at.clear()
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_sets": self.stale_sets,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+catalog_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_SIZE,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS
+)
+
+
+# ============== Catalog Cache Tags ==============
+
+CATEGORIES_TAG = "categories"
+PRODUCT_LISTS_TAG = "product-lists"
+FACETS_TAG = "facets"
+
+
+def product_tag(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def category_tag(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+def invalidate_products(*product_ids: int) -> None:
+    """Drop cached entries showing any of these products (e.g. stock changes)"""
+    catalog_cache.invalidate_tags(FACETS_TAG, *(product_tag(pid) for pid in product_ids))
@@ -0,0 +1,110 @@
+"""
+Dan Classic Furniture - Idempotency Keys
+Lets clients retry a POST with the same Idempotency-Key header and get the
+original response back instead of repeating the request. Keys are scoped
+to the user and stored in the database, so every worker sees them.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import Row, select, delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.idempotency import IdempotencyKey
+
+POLL_INTERVAL_SECONDS = 0.05
+
+
+def request_hash(payload: Any) -> str:
+    """Fingerprint a request body so a key cannot be reused for another request"""
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def replay(record: Row) -> JSONResponse:
+    """The stored response of a completed key"""
+    return JSONResponse(
+        status_code=record.status_code,
+        content=json.loads(record.response_body),
+        headers={"Idempotency-Replayed": "true"}
+    )
+
+
+async def claim_key(db: AsyncSession, user_id: int, key: str, fingerprint: str) -> Optional[Row]:
+    """Reserve a key for this request, or wait for the request holding it
+
+    Returns None once the key is reserved (the caller must then call
+    complete_key or release_key), or the stored response to replay.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        # Expired keys, and in-progress keys whose request died, free up here
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+        db.add(IdempotencyKey(
+            user_id=user_id,
+            key=key,
+            request_hash=fingerprint,
+            created_at=now,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        ))
+        try:
+            await db.commit()
+            return None
+        except IntegrityError:
+            await db.rollback()
+
+        record = (await db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response_body)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        )).first()
+        await db.rollback()  # End the read so the next poll sees new commits
+        if record is None:
+            continue  # Expired or released in between; try to claim it again
+        if record.request_hash != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key has already been used for a different request"
+            )
+        if record.status_code is not None:
+            return record
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def complete_key(db: AsyncSession, user_id: int, key: str, status_code: int, body: Any) -> None:
+    """Store the response for a claimed key in the caller's transaction"""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(
+            status_code=status_code,
+            response_body=json.dumps(body, default=str),
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+        )
+    )
+
+
+async def release_key(db: AsyncSession, user_id: int, key: str) -> None:
+    """Drop a claimed key after a failed request so a retry runs it again"""
+    await db.rollback()
+    await db.execute(
+        delete(IdempotencyKey)
+        .where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None)
+        )
+    )
+    await db.commit()
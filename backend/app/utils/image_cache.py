@@ -0,0 +1,118 @@
+"""
+Dan Classic Furniture - On-Demand Image Resize Cache
+Resized copies of uploads are rendered lazily in the image worker pool and
+kept on disk under an LRU size cap. Concurrent requests for the same size
+share a single render.
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.utils.uploads import image_processor, resize_image
+
+
+class ResizeCache:
+    """Disk cache of resized images, evicting least recently used files"""
+    
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries: Optional[OrderedDict] = None  # file name -> size, oldest first
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+    
+    def _load(self) -> OrderedDict:
+        """Index files left by earlier runs, oldest access first"""
+        if self._entries is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".jpg"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+            self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+            self.total_bytes = sum(self._entries.values())
+        return self._entries
+    
+    async def get(self, source: Path, width: int, height: int) -> Path:
+        """Return the cached resize of source, rendering it if needed"""
+        entries = self._load()
+        stat = source.stat()
+        key = f"{source}:{stat.st_mtime_ns}:{width}x{height}"
+        name = hashlib.sha1(key.encode()).hexdigest() + ".jpg"
+        path = self.directory / name
+        
+        if name in entries:
+            try:
+                os.utime(path)  # Keeps LRU order across restarts
+                entries.move_to_end(name)
+                self.hits += 1
+                return path
+            except FileNotFoundError:
+                self.total_bytes -= entries.pop(name)
+        
+        task = self._inflight.get(name)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._render(source, path, width, height))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting client does not cancel the render for others
+        return await asyncio.shield(task)
+    
+    async def _render(self, source: Path, path: Path, width: int, height: int) -> Path:
+        rendered = await image_processor.run(
+            resize_image, str(source), str(path), width, height,
+            label=f"{source.name} @ {width}x{height}"
+        )
+        if not rendered:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Image could not be resized"
+            )
+        
+        entries = self._load()
+        size = path.stat().st_size
+        entries[path.name] = size
+        self.total_bytes += size
+        self._evict()
+        return path
+    
+    def _evict(self) -> None:
+        # Never evict the newest entry, it is about to be served
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            (self.directory / name).unlink(missing_ok=True)
+            self.total_bytes -= size
+            self.evictions += 1
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        entries = self._entries or {}
+        return {
+            "files": len(entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+resize_cache = ResizeCache(
+    directory=settings.RESIZE_CACHE_DIR,
+    max_bytes=settings.RESIZE_CACHE_MAX_MB * 1024 * 1024
+)
@@ -0,0 +1,199 @@
+"""
+Dan Classic Furniture - Orphan Image Collector
+Periodically walks the uploads tree and deletes files that no product,
+category or order item refers to. Only files older than a grace period are
+touched, so uploads whose transaction has not committed yet are safe. The
+walk runs in small batches in a thread, so requests keep being served.
+"""
+import asyncio
+import logging
+import os
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.image import StoredImage
+from app.models.order import OrderItem
+from app.models.product import Product, Category
+from app.utils.uploads import get_upload_path, variant_paths, STORED_IMAGE_DIR
+
+logger = logging.getLogger(__name__)
+
+HASH_LENGTH = 64
+
+
+def walk_uploads(root: Path) -> Iterator[tuple[str, Path, int, float]]:
+    """Yield (url path, file, size, mtime) for every upload, skipping temporary files"""
+    for directory, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.startswith(".") or name.endswith(".part"):
+                continue
+            path = Path(directory) / name
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            url = "/uploads/" + path.relative_to(root).as_posix()
+            yield url, path, stat.st_size, stat.st_mtime
+
+
+def stored_hash(url: str) -> Optional[str]:
+    """Content hash of a file in the content-addressed store, else None"""
+    if not url.startswith(f"/uploads/{STORED_IMAGE_DIR}/"):
+        return None
+    return url.rsplit("/", 1)[-1][:HASH_LENGTH]
+
+
+class OrphanImageCollector:
+    """Background job deleting unreferenced uploads"""
+    
+    def __init__(self, interval: float, grace: float, batch_size: int):
+        self.interval = interval
+        self.grace = grace
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.files_scanned = 0
+        self.files_deleted = 0
+        self.bytes_reclaimed = 0
+        self.last_run: Optional[float] = None
+        self.last_duration = 0.0
+    
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.collect()
+            except Exception:
+                logger.exception("Orphan image collection failed")
+    
+    async def collect(self) -> dict:
+        """Run one full pass over the uploads tree, returning what it reclaimed"""
+        start = time.perf_counter()
+        root = get_upload_path()
+        paths, hashes = await self._load_references()
+        cutoff = time.time() - self.grace
+        
+        scanned = deleted = reclaimed = 0
+        files = walk_uploads(root)
+        while batch := await asyncio.to_thread(lambda: list(islice(files, self.batch_size))):
+            scanned += len(batch)
+            candidates = [
+                (url, path, size, mtime) for url, path, size, mtime in batch
+                if mtime < cutoff and url not in paths and stored_hash(url) not in hashes
+            ]
+            if candidates:
+                removed, freed = await self._delete(root, candidates)
+                deleted += removed
+                reclaimed += freed
+        
+        self.passes += 1
+        self.files_scanned += scanned
+        self.files_deleted += deleted
+        self.bytes_reclaimed += reclaimed
+        self.last_run = time.time()
+        self.last_duration = time.perf_counter() - start
+        logger.info(
+            "Orphan image collection: scanned %d files, deleted %d, reclaimed %d bytes",
+            scanned, deleted, reclaimed
+        )
+        return {"scanned": scanned, "deleted": deleted, "bytes_reclaimed": reclaimed}
+    
+    async def _load_references(self) -> tuple[set[str], set[str]]:
+        """Every referenced upload path, and the hashes of referenced stored images"""
+        paths: set[str] = set()
+        async with AsyncSessionLocal() as db:
+            for images, variants in await db.execute(select(Product.images, Product.image_variants)):
+                paths.update(images or [])
+                for image_variants in (variants or {}).values():
+                    paths.update(variant_paths(image_variants))
+            paths.update(await db.scalars(select(Category.image).where(Category.image.isnot(None))))
+            # Order history keeps showing the image a product had when ordered
+            paths.update(await db.scalars(
+                select(OrderItem.product_image).where(OrderItem.product_image.isnot(None))
+            ))
+        hashes = {stored_hash(path) for path in paths} - {None}
+        return paths, hashes
+    
+    async def _delete(self, root: Path, candidates: list) -> tuple[int, int]:
+        # Stored images may have gained a reference since the pass started
+        batch_hashes = {stored_hash(url) for url, *_ in candidates} - {None}
+        if batch_hashes:
+            async with AsyncSessionLocal() as db:
+                in_use = set(await db.scalars(
+                    select(StoredImage.content_hash).where(
+                        StoredImage.content_hash.in_(batch_hashes), StoredImage.ref_count > 0
+                    )
+                ))
+            candidates = [c for c in candidates if stored_hash(c[0]) not in in_use]
+        
+        def unlink_all() -> tuple[int, int]:
+            removed = freed = 0
+            cutoff = time.time() - self.grace
+            for url, path, size, _ in candidates:
+                digest = stored_hash(url)
+                if digest is not None:
+                    # A re-upload of the same content refreshes its manifest
+                    manifest = path.with_name(f"{digest}.json")
+                    try:
+                        manifest_stat = manifest.stat()
+                        if manifest != path:
+                            if manifest_stat.st_mtime >= cutoff:
+                                continue
+                            # Manifest first, so no upload is deduplicated onto a set being deleted
+                            manifest.unlink()
+                            removed += 1
+                            freed += manifest_stat.st_size
+                    except FileNotFoundError:
+                        pass
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                except OSError as exc:
+                    logger.warning("Could not delete orphan %s: %s", url, exc)
+                    continue
+                removed += 1
+                freed += size
+            return removed, freed
+        
+        return await asyncio.to_thread(unlink_all)
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "enabled": self.interval > 0,
+            "interval_seconds": self.interval,
+            "grace_seconds": self.grace,
+            "running": self._task is not None,
+            "passes": self.passes,
+            "files_scanned": self.files_scanned,
+            "files_deleted": self.files_deleted,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "last_run": self.last_run,
+            "last_duration_seconds": round(self.last_duration, 3),
+        }
+
+
+orphan_collector = OrphanImageCollector(
+    interval=settings.IMAGE_GC_INTERVAL_SECONDS,
+    grace=settings.IMAGE_GC_GRACE_SECONDS,
+    batch_size=settings.IMAGE_GC_BATCH_SIZE
+)
@@ -0,0 +1,106 @@
+"""
+Dan Classic Furniture - Stored Image Reference Counting
+Product.images and Category.image entries that point into the
+content-addressed store hold a reference on the StoredImage row. Only
+paths known to the store are counted; older uploads are ignored. Order
+items keep showing the image they were placed with, so an image still used
+by an order item is never deleted, whatever its count.
+"""
+from collections import Counter
+from typing import Iterable
+from sqlalchemy import select, update, delete, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.image import StoredImage
+from app.models.order import OrderItem
+from app.utils.uploads import delete_stored_image
+
+
+async def register_images(db: AsyncSession, uploaded: list[dict]) -> None:
+    """Make sure freshly uploaded images have a StoredImage row"""
+    hashes = {image["hash"] for image in uploaded}
+    if not hashes:
+        return
+    known = set(await db.scalars(
+        select(StoredImage.content_hash).where(StoredImage.content_hash.in_(hashes))
+    ))
+    for image in uploaded:
+        if image["hash"] not in known:
+            known.add(image["hash"])
+            db.add(StoredImage(
+                content_hash=image["hash"],
+                path=image["path"],
+                variants=image["variants"],
+                placeholder=image.get("placeholder"),
+                ref_count=0
+            ))
+    await db.flush()
+
+
+async def retain_images(db: AsyncSession, paths: Iterable[str]) -> dict[str, dict]:
+    """Add a reference for every occurrence of a stored image path
+    
+    Returns {path: {"variants", "placeholder"}} for the stored images referenced.
+    """
+    counts = Counter(path for path in paths if path)
+    if not counts:
+        return {}
+    for path, count in counts.items():
+        await db.execute(
+            update(StoredImage)
+            .where(StoredImage.path == path)
+            .values(ref_count=StoredImage.ref_count + count)
+        )
+    rows = await db.execute(
+        select(StoredImage.path, StoredImage.variants, StoredImage.placeholder)
+        .where(StoredImage.path.in_(counts))
+    )
+    return {
+        path: {"variants": variants or {}, "placeholder": placeholder}
+        for path, variants, placeholder in rows
+    }
+
+
+async def release_images(db: AsyncSession, paths: Iterable[str]) -> list[dict]:
+    """Drop a reference for every occurrence of a stored image path
+    
+    Images left without references, and not shown by any order item, are
+    removed from the store. Returns them
+    so the caller can delete their files with delete_released_images once the
+    transaction has committed.
+    """
+    counts = Counter(path for path in paths if path)
+    if not counts:
+        return []
+    for path, count in counts.items():
+        await db.execute(
+            update(StoredImage)
+            .where(StoredImage.path == path)
+            .values(ref_count=StoredImage.ref_count - count)
+        )
+    unreferenced = (
+        StoredImage.path.in_(counts)
+        & (StoredImage.ref_count <= 0)
+        & ~exists().where(OrderItem.product_image == StoredImage.path)
+    )
+    released = [
+        {"hash": content_hash, "path": path, "variants": variants}
+        for content_hash, path, variants in await db.execute(
+            select(StoredImage.content_hash, StoredImage.path, StoredImage.variants).where(unreferenced)
+        )
+    ]
+    if released:
+        await db.execute(delete(StoredImage).where(unreferenced))
+    return released
+
+
+def delete_released_images(released: list[dict]) -> None:
+    """Delete the files of images released by release_images"""
+    for image in released:
+        delete_stored_image(image)
+
+
+def reference_diff(old: Iterable[str], new: Iterable[str]) -> tuple[list[str], list[str]]:
+    """Paths gained and lost (with multiplicity) going from old to new"""
+    old, new = Counter(old or []), Counter(new or [])
+    return list((new - old).elements()), list((old - new).elements())
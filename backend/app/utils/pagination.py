@@ -0,0 +1,61 @@
+"""
+Dan Classic Furniture - Keyset (Cursor) Pagination Utilities
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Select, and_, or_
+
+
+def encode_cursor(value, row_id: int) -> str:
+    """Encode the sort key and id of the last row into an opaque cursor"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, column) -> tuple:
+    """Decode a cursor back into (sort value, id) for the given sort column"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(column.type, DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def apply_keyset(
+    query: Select,
+    column,
+    id_column,
+    descending: bool,
+    cursor: Optional[str]
+) -> Select:
+    """Order a query by (column, id) and start it after the given cursor"""
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, column)
+        if descending:
+            query = query.where(or_(
+                column < value,
+                and_(column == value, id_column < last_id)
+            ))
+        else:
+            query = query.where(or_(
+                column > value,
+                and_(column == value, id_column > last_id)
+            ))
+
+    return query
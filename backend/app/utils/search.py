@@ -0,0 +1,130 @@
+"""
+Dan Classic Furniture - Product Full-Text Search
+SQLite uses an FTS5 table kept in sync by triggers, PostgreSQL uses a GIN
+index over a tsvector expression. Other databases fall back to ILIKE.
+"""
+import re
+from sqlalchemy import Float, Integer, Select, func, literal_column, or_, text
+from sqlalchemy.engine import Connection
+
+from app.models.product import Product
+
+# Must match the indexed expression exactly for PostgreSQL to use the index
+PG_SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(products.name, '') || ' ' || "
+    "coalesce(products.description, ''))"
+)
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, content='products', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+
+def init_search(conn: Connection) -> None:
+    """Create the search index for the current database if missing"""
+    if conn.dialect.name == "sqlite":
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        )).first()
+        for statement in SQLITE_SEARCH_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            # Index products created before the search table existed
+            conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN ({PG_SEARCH_VECTOR})"
+        ))
+
+
+def search_terms(search: str) -> list[str]:
+    """Split a search string into safe lowercase word tokens"""
+    return re.findall(r"\w+", search.lower())
+
+
+def sqlite_match(terms: list[str]) -> str:
+    """FTS5 query prefix matching every term"""
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def pg_search(terms: list[str]) -> tuple[object, object]:
+    """The indexed tsvector expression and a tsquery matching every term"""
+    vector = literal_column(PG_SEARCH_VECTOR)
+    ts_query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+    return vector, ts_query
+
+
+def apply_product_search(query: Select, search: str, dialect: str) -> tuple[Select, bool]:
+    """Filter a product query by search text
+
+    Returns the filtered query and whether order_by_relevance can rank it
+    (False when the database has no full-text support). Every term is
+    prefix matched, so "sof" finds "sofa".
+
+    On SQLite the matches are an uncorrelated IN subquery, so the MATCH runs
+    once whichever index the planner picks for products. Joining the FTS
+    table instead lets it scan products first and re-run the MATCH per row.
+    """
+    terms = search_terms(search)
+
+    if terms and dialect == "sqlite":
+        matches = (
+            text("SELECT rowid FROM products_fts WHERE products_fts MATCH :match")
+            .bindparams(match=sqlite_match(terms))
+            .columns(rowid=Integer)
+        )
+        return query.where(Product.id.in_(matches)), True
+
+    if terms and dialect == "postgresql":
+        vector, ts_query = pg_search(terms)
+        return query.where(vector.op("@@")(ts_query)), True
+
+    query = query.where(
+        or_(
+            Product.name.ilike(f"%{search}%"),
+            Product.description.ilike(f"%{search}%")
+        )
+    )
+    return query, False
+
+
+def order_by_relevance(query: Select, search: str, dialect: str) -> Select:
+    """Order a query filtered by apply_product_search, most relevant first
+
+    Only the page query needs this; counts and facets are left unranked.
+    On SQLite the bm25 scores are computed once in a materialized CTE.
+    """
+    terms = search_terms(search)
+
+    if terms and dialect == "sqlite":
+        ranks = (
+            text("SELECT rowid AS product_id, bm25(products_fts) AS rank "
+                 "FROM products_fts WHERE products_fts MATCH :match")
+            .bindparams(match=sqlite_match(terms))
+            .columns(product_id=Integer, rank=Float)
+            .cte("search_ranks")
+            .prefix_with("MATERIALIZED")
+        )
+        return query.join(ranks, ranks.c.product_id == Product.id).order_by(ranks.c.rank.asc())
+
+    if terms and dialect == "postgresql":
+        vector, ts_query = pg_search(terms)
+        return query.order_by(func.ts_rank(vector, ts_query).desc())
+
+    return query
@@ -0,0 +1,84 @@
+"""
+Dan Classic Furniture - Upload File Serving
+Upload file names are unique and never reused for other content, so files
+are served as immutable with a strong ETag derived from the name.
+"""
+import os
+from pathlib import Path
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Only images are served; manifests and temporary files stay private
+SERVED_EXTENSIONS = {ext.strip().lower() for ext in settings.ALLOWED_EXTENSIONS} | {"jpg", "jpeg", "webp"}
+
+
+def upload_etag(path: Path, stat_result: os.stat_result) -> str:
+    """Strong ETag for an upload (name plus size, as names never change content)"""
+    return f'"{path.name}-{stat_result.st_size:x}"'
+
+
+class UploadFileResponse(FileResponse):
+    """FileResponse with immutable caching, a name-based ETag and zero-copy sends
+    
+    Whole-file responses use the ASGI pathsend extension when the server
+    offers it, letting the server sendfile() the file. Range requests are
+    handled by FileResponse; If-Range is checked against our ETag.
+    
+    _should_use_range and _handle_simple are private FileResponse methods,
+    which is why starlette is pinned; check_upload_serving.py fails if an
+    upgrade drops them.
+    """
+    chunk_size = 256 * 1024
+    
+    def __init__(self, path: Path, stat_result: os.stat_result, media_type: str = None):
+        super().__init__(
+            path,
+            stat_result=stat_result,
+            media_type=media_type,
+            headers={
+                "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+                "ETag": upload_etag(Path(path), stat_result),
+            }
+        )
+        self._pathsend = False
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._pathsend = "http.response.pathsend" in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+    
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:
+        return http_if_range in (self.headers["etag"], self.headers["last-modified"])
+    
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if not self._pathsend or send_header_only:
+            await super()._handle_simple(send, send_header_only)
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles for the uploads tree, serving images only"""
+    
+    def file_response(
+        self,
+        full_path: os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        path = Path(full_path)
+        if path.name.startswith(".") or path.suffix.lower().lstrip(".") not in SERVED_EXTENSIONS:
+            raise HTTPException(status_code=404)
+        
+        response = UploadFileResponse(path, stat_result)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
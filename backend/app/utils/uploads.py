@@ -1,16 +1,40 @@
 """
 Dan Classic Furniture - File Upload Utilities
 """
+import io
 import os
+import json
+import base64
 import uuid
+import time
+import hashlib
+import asyncio
+import logging
+import multiprocessing
 import aiofiles
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from fastapi import UploadFile, HTTPException, status
-from PIL import Image
-from io import BytesIO
+from typing import Callable, Optional
+from fastapi import UploadFile, HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from PIL import Image, UnidentifiedImageError
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Pillow refuses to decode beyond twice this (DecompressionBombError), also in workers
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+MAX_IMAGE_WIDTH = 1200
+# Responsive variant widths; the largest one is the stored main image
+IMAGE_VARIANTS = {"thumb": 320, "medium": 640, "large": MAX_IMAGE_WIDTH}
+PLACEHOLDER_SIZE = 20  # px, longest side
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Content-addressed image store, relative to the upload directory
+STORED_IMAGE_DIR = "images"
+
 
 def get_upload_path() -> Path:
     """Get the upload directory path"""
@@ -38,62 +62,448 @@ def validate_image(file: UploadFile) -> None:
         )
 
 
-async def save_upload_file(file: UploadFile, subfolder: str = "products") -> str:
-    """Save uploaded file and return the path"""
-    validate_image(file)
+def make_placeholder(image: Image.Image) -> str:
+    """Tiny preview of an image as a data URI, shown while the image loads"""
+    preview = image.copy()
+    if preview.mode not in ("RGB", "L"):
+        preview = preview.convert("RGB")
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    preview.save(buffer, "WEBP", quality=50)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def open_image(source: str, max_width: int, max_height: Optional[int] = None) -> Image.Image:
+    """Open an image that will be shrunk to fit max_width x max_height
+    
+    JPEGs use draft mode to decode straight at the smallest 1/2, 1/4 or 1/8
+    scale that still covers the fitted size, so a large photo never exists
+    in memory at full resolution. Images over MAX_IMAGE_PIXELS are refused
+    before decoding.
+    """
+    image = Image.open(source)
+    width, height = image.size
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        image.close()
+        raise ValueError(f"Image exceeds {settings.MAX_IMAGE_PIXELS} pixels")
+    scale = min(1, max_width / width, (max_height or height) / height)
+    image.draft(image.mode, (max(1, round(width * scale)), max(1, round(height * scale))))
+    return image
+
+
+def transform_image(source: str, destination: str) -> Optional[dict]:
+    """Resize and re-encode an image into its size variants (runs in a worker process)
+    
+    The largest variant is written as JPEG to destination; every variant is
+    also written as <stem>_<name>.jpg/.webp next to it. Variants wider than
+    the source are skipped so images are never upscaled. Returns
+    {"variants": {name: {"width", "jpeg", "webp"}}, "placeholder": data URI}
+    with file names, or None if the source cannot be processed as an image.
+    """
+    destination = Path(destination)
+    written: list[Path] = []
+    try:
+        largest = max(IMAGE_VARIANTS.values())
+        image = open_image(source, largest)
+        
+        # Convert to RGB if necessary (for PNG transparency)
+        if image.mode in ("RGBA", "P"):
+            image = image.convert("RGB")
+        
+        variants = {}
+        # Largest first, so each smaller variant is resized from the previous one
+        for name, width in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+            if width != largest and width >= image.width:
+                continue
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                # reducing_gap shrinks by whole factors first, then LANCZOS for the rest
+                image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            
+            jpeg = destination if width == largest else destination.with_name(f"{destination.stem}_{name}.jpg")
+            webp = destination.with_name(f"{destination.stem}_{name}.webp")
+            image.save(jpeg, "JPEG", quality=85, optimize=True)
+            written.append(jpeg)
+            image.save(webp, "WEBP", quality=80, method=4)
+            written.append(webp)
+            variants[name] = {"width": image.width, "jpeg": jpeg.name, "webp": webp.name}
+        # The smallest variant is the cheapest source for the placeholder
+        return {"variants": variants, "placeholder": make_placeholder(image)}
+    except Exception:
+        for path in written:
+            path.unlink(missing_ok=True)
+        return None
+
+
+def resize_image(source: str, destination: str, width: int, height: int) -> bool:
+    """Fit an image within width x height as JPEG (runs in a worker process)
+    
+    Never upscales. Writes through a temporary file so a concurrent reader
+    never sees a partial image. Returns False if the source cannot be read.
+    """
+    temp = f"{destination}.{os.getpid()}.part"
+    try:
+        with open_image(source, width, height) as image:
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+            image.save(temp, "JPEG", quality=85, optimize=True)
+        os.replace(temp, destination)
+        return True
+    except Exception:
+        Path(temp).unlink(missing_ok=True)
+        return False
+
+
+def variant_paths(variants: dict) -> list[str]:
+    """All files of an image's variant set (may include the main image path)"""
+    return [
+        path
+        for variant in (variants or {}).values()
+        for path in (variant.get("jpeg"), variant.get("webp"))
+        if path
+    ]
+
+
+class ImageProcessor:
+    """Bounded process pool for image transforms
     
-    # Read file content
-    content = await file.read()
+    At most IMAGE_WORKERS images are transformed at once and at most
+    IMAGE_QUEUE_DEPTH more may wait; beyond that uploads get a 503 so the
+    API worker never queues unbounded CPU work. Workers are started from a
+    fork server (or spawned) rather than forked from the threaded API
+    process, and a pool broken by a dead worker (e.g. OOM killed on a huge
+    photo) is replaced on the next call.
+    """
     
-    # Check file size
-    if len(content) > settings.MAX_FILE_SIZE_MB * 1024 * 1024:
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.capacity = workers + queue_depth
+        self.pending = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.pool_restarts = 0
+        self.deduplicated = 0  # uploads served from an already stored image
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(method)
+            )
+        return self._pool
+    
+    async def transform(self, source: Path, destination: Path, filename: str = "") -> Optional[dict]:
+        """Transform an uploaded image into its variants and placeholder"""
+        return await self.run(transform_image, str(source), str(destination), label=filename)
+    
+    async def run(self, func: Callable, *args, label: str = ""):
+        """Run an image function off the event loop, applying backpressure
+        
+        A falsy result counts as a failed transform.
+        """
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing is busy. Please retry shortly.",
+                headers={"Retry-After": "5"}
+            )
+        
+        self.pending += 1
+        start = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            self.failed += 1
+            if self._pool is pool:  # Concurrent callers see the same broken pool
+                logger.error("Image worker died while processing %s; restarting the pool", label)
+                self.pool_restarts += 1
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing failed. Please retry shortly.",
+                headers={"Retry-After": "5"}
+            )
+        finally:
+            self.pending -= 1
+        
+        elapsed = time.perf_counter() - start
+        self.processed += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        if not result:
+            self.failed += 1
+        logger.info("Processed image %s in %.1f ms", label, elapsed * 1000)
+        return result
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "pending": self.pending,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "pool_restarts": self.pool_restarts,
+            "deduplicated": self.deduplicated,
+            "avg_ms": round(self.total_seconds / self.processed * 1000, 1) if self.processed else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+    
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_processor = ImageProcessor(
+    workers=settings.IMAGE_WORKERS,
+    queue_depth=settings.IMAGE_QUEUE_DEPTH
+)
+
+
+MULTIPART_OVERHEAD = 16 * 1024  # boundary and part headers allowed per file
+
+
+def check_upload_length(request: Request) -> None:
+    """Refuse an upload request from its Content-Length alone
+    
+    The multipart body is received and spooled by Starlette before the
+    endpoint runs, so this is the only point where an oversized request can
+    be turned away before it is transferred.
+    """
+    length = request.headers.get("content-length")
+    if length is None:
+        raise HTTPException(status_code=status.HTTP_411_LENGTH_REQUIRED, detail="Content-Length required")
+    max_bytes = settings.MAX_UPLOAD_FILES * (settings.MAX_FILE_SIZE_MB * 1024 * 1024 + MULTIPART_OVERHEAD)
+    try:
+        too_large = int(length) > max_bytes
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Content-Length")
+    if too_large:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload too large. Maximum: {settings.MAX_UPLOAD_FILES} files of "
+                   f"{settings.MAX_FILE_SIZE_MB}MB"
         )
+
+
+class UploadRoute(APIRoute):
+    """Route that checks Content-Length before the request body is read"""
     
-    # Create subfolder
-    upload_path = get_upload_path() / subfolder
-    upload_path.mkdir(exist_ok=True)
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        
+        async def upload_handler(request: Request) -> Response:
+            check_upload_length(request)
+            return await handler(request)
+        
+        return upload_handler
+
+
+async def stream_to_file(file: UploadFile, destination: Path) -> tuple[int, str]:
+    """Copy an upload into the store in chunks, enforcing the per-file size limit
     
-    # Generate unique filename
-    ext = file.filename.split(".")[-1].lower() if file.filename else "jpg"
-    filename = f"{uuid.uuid4().hex}.{ext}"
-    file_path = upload_path / filename
+    The upload has already been spooled by Starlette; this bounds memory
+    while copying it. Returns the size and the SHA-256 hex digest of the
+    content.
+    """
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(destination, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE_MB}MB"
+                    )
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
+def probe_image(path: Path) -> tuple[str, int, int]:
+    """Read format and dimensions from the image header without decoding it"""
+    try:
+        with Image.open(path) as image:
+            info = image.format, image.width, image.height
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an image"
+        )
+    except Image.DecompressionBombError:
+        info = None  # Over twice the limit, Pillow refuses to open it at all
+    if info is None or info[1] * info[2] > settings.MAX_IMAGE_PIXELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Image too large. Maximum size: {settings.MAX_IMAGE_PIXELS // 1_000_000} megapixels"
+        )
+    return info
+
+
+def read_manifest(path: Path) -> Optional[dict]:
+    """Load a stored image manifest, or None if the image is not (fully) stored"""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(path: Path, manifest: dict) -> None:
+    temp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+    temp.write_text(json.dumps(manifest))
+    os.replace(temp, path)
+
+
+_storing: dict[str, asyncio.Task] = {}  # content hash -> store in progress
+
+
+async def store_image(source: Path, digest: str, filename: str = "") -> dict:
+    """Store an image file under its content hash
     
-    # Optimize image before saving
+    Content that is already stored is returned as is without transcoding,
+    and concurrent stores of the same content in this process share one
+    transcode. "created" is True only for the caller that wrote the files.
+    """
+    task = _storing.get(digest)
+    owner = task is None
+    if owner:
+        task = asyncio.ensure_future(_store_image(source, digest, filename))
+        _storing[digest] = task
+        task.add_done_callback(lambda _: _storing.pop(digest, None))
+    # Shielded so a disconnecting client does not cancel the store for others
+    stored = await asyncio.shield(task)
+    return dict(stored, created=stored["created"] and owner)
+
+
+async def _store_image(source: Path, digest: str, filename: str) -> dict:
+    # The manifest is written last, so its presence means the set is complete
+    directory = get_upload_path() / STORED_IMAGE_DIR / digest[:2]
+    manifest_path = directory / f"{digest}.json"
+    manifest = await asyncio.to_thread(read_manifest, manifest_path)
+    if manifest is not None:
+        # Marks the set as in use so the orphan collector's grace period applies
+        await asyncio.to_thread(os.utime, manifest_path)
+        image_processor.deduplicated += 1
+        return dict(manifest, created=False)
+    
+    directory.mkdir(parents=True, exist_ok=True)
+    file_path = directory / f"{digest}.jpg"
     try:
-        image = Image.open(BytesIO(content))
+        await asyncio.to_thread(probe_image, source)
         
-        # Convert to RGB if necessary (for PNG transparency)
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
+        # Optimize image and build its variants (in a worker process)
+        transformed = await image_processor.transform(source, file_path, filename)
+        if transformed is None:
+            # If image processing fails, save original
+            ext = filename.split(".")[-1].lower() if "." in filename else "jpg"
+            file_path = directory / f"{digest}.{ext}"
+            os.replace(source, file_path)
+            transformed = {"variants": {}, "placeholder": None}
         
-        # Resize if too large (max 1200px width)
-        max_width = 1200
-        if image.width > max_width:
-            ratio = max_width / image.width
-            new_height = int(image.height * ratio)
-            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Save optimized image
-        image.save(str(file_path), "JPEG", quality=85, optimize=True)
-    except Exception:
-        # If image processing fails, save original
-        async with aiofiles.open(file_path, "wb") as f:
-            await f.write(content)
+        base = f"/uploads/{STORED_IMAGE_DIR}/{digest[:2]}"
+        manifest = {
+            "hash": digest,
+            "path": f"{base}/{file_path.name}",
+            "variants": {
+                name: {
+                    "width": variant["width"],
+                    "jpeg": f"{base}/{variant['jpeg']}",
+                    "webp": f"{base}/{variant['webp']}",
+                }
+                for name, variant in transformed["variants"].items()
+            },
+            "placeholder": transformed["placeholder"],
+        }
+        await asyncio.to_thread(write_manifest, manifest_path, manifest)
+    except BaseException:
+        for path in directory.glob(f"{digest}*"):
+            path.unlink(missing_ok=True)
+        raise
+    return dict(manifest, created=True)
+
+
+async def save_upload_file(file: UploadFile) -> dict:
+    """Save uploaded file by content hash and return where it is stored
+    
+    Returns {"hash", "path": "/uploads/...", "variants": {name: {"width",
+    "jpeg", "webp"}}, "placeholder", "created"}. Variants are empty and the
+    placeholder None if the image could not be re-encoded; "created" is
+    False when identical content was already stored.
+    """
+    validate_image(file)
     
-    return f"/uploads/{subfolder}/{filename}"
+    upload_path = get_upload_path() / STORED_IMAGE_DIR
+    upload_path.mkdir(parents=True, exist_ok=True)
+    
+    # Stream to a temporary file so memory use does not grow with file size
+    temp_path = upload_path / f".{uuid.uuid4().hex}.part"
+    _, digest = await stream_to_file(file, temp_path)
+    try:
+        return await store_image(temp_path, digest, file.filename or "")
+    finally:
+        temp_path.unlink(missing_ok=True)
 
 
-async def save_multiple_files(files: list[UploadFile], subfolder: str = "products") -> list[str]:
-    """Save multiple uploaded files"""
-    paths = []
-    for file in files:
-        if file.filename:  # Skip empty files
-            path = await save_upload_file(file, subfolder)
-            paths.append(path)
-    return paths
+async def save_multiple_files(files: list[UploadFile]) -> list[dict]:
+    """Save multiple uploaded files concurrently, keeping submission order
+    
+    If any file fails, the images newly stored for this request are deleted
+    and the first error is raised. Images that were already stored are kept,
+    since other products or categories may use them.
+    """
+    files = [file for file in files if file.filename]  # Skip empty files
+    if len(files) > settings.MAX_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many files. Maximum: {settings.MAX_UPLOAD_FILES}"
+        )
+    limit = asyncio.Semaphore(settings.UPLOAD_PARALLELISM)
+    
+    async def save_one(file: UploadFile) -> dict:
+        async with limit:
+            return await save_upload_file(file)
+    
+    results = await asyncio.gather(*(save_one(file) for file in files), return_exceptions=True)
+    
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        for result in results:
+            if isinstance(result, dict) and result["created"]:
+                delete_stored_image(result)
+        raise errors[0]
+    
+    return list(results)
+
+
+def delete_stored_image(image: dict) -> None:
+    """Delete a content-addressed image, its variants and its manifest"""
+    delete_image(image["path"], image.get("variants"))
+    digest = image["hash"]
+    delete_file(f"/uploads/{STORED_IMAGE_DIR}/{digest[:2]}/{digest}.json")
+
+
+def delete_image(image_path: str, variants: Optional[dict] = None) -> None:
+    """Delete an uploaded image together with its size variants"""
+    for path in {image_path, *variant_paths(variants)}:
+        delete_file(path)
 
 
 def delete_file(file_path: str) -> bool:
@@ -105,6 +515,7 @@ def delete_file(file_path: str) -> bool:
         if full_path.exists():
             full_path.unlink()
             return True
-    except Exception:
-        pass
+    except Exception as exc:
+        # Leftovers are reclaimed later by the orphan image collector
+        logger.warning("Could not delete %s: %s", file_path, exc)
     return False
@@ -0,0 +1,91 @@
+"""
+Dan Classic Furniture - Image Placeholder Backfill
+Computes the inline placeholder for product images uploaded before
+placeholders existed, and for stored images that lack one. Safe to re-run:
+images that already have a placeholder are skipped.
+
+Usage: python backfill_placeholders.py
+"""
+import sys
+import os
+from pathlib import Path
+from typing import Optional
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+
+from app.config import settings
+from app.database import SessionLocal, init_db
+from app.models.image import StoredImage
+from app.models.product import Product
+from app.utils.uploads import (
+    make_placeholder, read_manifest, write_manifest, PLACEHOLDER_SIZE
+)
+
+
+def upload_file(path: str) -> Path:
+    """Disk location of an /uploads/... path"""
+    return Path(settings.UPLOAD_DIR) / path.removeprefix("/uploads/")
+
+
+def placeholder_for(path: str, variants: dict) -> Optional[str]:
+    """Placeholder for an image, read from its smallest variant when there is one"""
+    smallest = min((variants or {}).values(), key=lambda v: v["width"], default=None)
+    source = upload_file(smallest["jpeg"] if smallest else path)
+    try:
+        with Image.open(source) as image:
+            # Let JPEG decode at a fraction of full size
+            image.draft("RGB", (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            return make_placeholder(image)
+    except Exception as exc:
+        print(f"[WARN] Skipping {path}: {exc}")
+        return None
+
+
+def backfill_placeholders():
+    """Fill in missing placeholders on stored images and products"""
+    init_db()
+    db = SessionLocal()
+    
+    try:
+        stored_count = 0
+        for stored in db.query(StoredImage).filter(StoredImage.placeholder.is_(None)):
+            stored.placeholder = placeholder_for(stored.path, stored.variants)
+            if stored.placeholder is None:
+                continue
+            stored_count += 1
+            # Keep the manifest in step, it is reused for duplicate uploads
+            manifest_path = upload_file(stored.path).with_name(f"{stored.content_hash}.json")
+            manifest = read_manifest(manifest_path)
+            if manifest is not None:
+                write_manifest(manifest_path, dict(manifest, placeholder=stored.placeholder))
+        db.commit()
+        print(f"[OK] Stored images updated: {stored_count}")
+        
+        stored = dict(db.query(StoredImage.path, StoredImage.placeholder))
+        product_count = 0
+        for product in db.query(Product).order_by(Product.id):
+            placeholders = dict(product.image_placeholders or {})
+            variants = product.image_variants or {}
+            for path in product.images or []:
+                if path in placeholders:
+                    continue
+                placeholder = stored.get(path) or placeholder_for(path, variants.get(path))
+                if placeholder:
+                    placeholders[path] = placeholder
+            if placeholders != (product.image_placeholders or {}):
+                product.image_placeholders = placeholders
+                product_count += 1
+        db.commit()
+        print(f"[OK] Products updated: {product_count}")
+    
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] Error backfilling placeholders: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    backfill_placeholders()
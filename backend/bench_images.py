@@ -0,0 +1,106 @@
+"""
+Dan Classic Furniture - Image Decode Benchmark
+Measures peak memory and time to turn a large phone photo into the upload
+variants, decoding at full resolution (the old path) versus draft mode.
+Each run happens in a fresh process so peak RSS is per image.
+
+Usage: python bench_images.py [megapixels ...]
+"""
+import sys
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+
+from app.utils.uploads import transform_image, MAX_IMAGE_WIDTH
+
+RUNS = 3
+
+
+def full_decode(source: str, destination: str) -> None:
+    """The previous upload path: decode everything, then resize"""
+    image = Image.open(source)
+    if image.mode in ("RGBA", "P"):
+        image = image.convert("RGB")
+    if image.width > MAX_IMAGE_WIDTH:
+        height = int(image.height * MAX_IMAGE_WIDTH / image.width)
+        image = image.resize((MAX_IMAGE_WIDTH, height), Image.Resampling.LANCZOS)
+    image.save(destination, "JPEG", quality=85, optimize=True)
+
+
+def peak_rss_kb() -> int:
+    """Peak resident memory of this process
+    
+    ru_maxrss survives fork/exec on Linux, so it would report the parent's
+    peak; VmHWM belongs to the current address space only.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode: str, source: str, destination: str) -> tuple[float, float]:
+    """Seconds and peak RSS growth (MB) for one image, run in a fresh process"""
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    if mode == "full":
+        full_decode(source, destination)
+    else:
+        if mode == "nodraft":
+            JpegImageFile.draft = lambda self, mode, size: None
+        if transform_image(source, destination) is None:
+            raise RuntimeError("transform_image failed")
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    return elapsed, (peak - baseline) / 1024
+
+
+def make_photo(path: str, megapixels: float) -> tuple[int, int]:
+    """Write a noisy 4:3 JPEG, which compresses about like a real photo"""
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    noise = Image.effect_noise((width // 4, height // 4), 40).resize((width, height))
+    gradient = Image.linear_gradient("L").resize((width, height))
+    Image.merge("RGB", (noise, gradient, noise)).save(path, "JPEG", quality=90)
+    return width, height
+
+
+def run_benchmark(sizes: list[float]) -> None:
+    workdir = tempfile.mkdtemp()
+    spawn = get_context("spawn")
+    
+    for megapixels in sizes:
+        source = os.path.join(workdir, f"photo_{megapixels}mp.jpg")
+        width, height = make_photo(source, megapixels)
+        size_mb = os.path.getsize(source) / 1024 / 1024
+        print(f"\n{width}x{height} ({megapixels}MP, {size_mb:.1f}MB JPEG)")
+        
+        for mode in ("full", "nodraft", "draft"):
+            times, memory = [], []
+            for run in range(RUNS):
+                destination = os.path.join(workdir, f"out_{mode}_{run}.jpg")
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    elapsed, peak_mb = pool.submit(measure, mode, source, destination).result()
+                times.append(elapsed)
+                memory.append(peak_mb)
+            label = {
+                "full": "full decode, 1 JPEG",
+                "nodraft": "full decode, all variants",
+                "draft": "draft decode, all variants",
+            }[mode]
+            print(f"  {label:<26} {sorted(times)[RUNS // 2] * 1000:8.0f} ms  {max(memory):7.1f} MB peak")
+
+
+if __name__ == "__main__":
+    run_benchmark([float(arg) for arg in sys.argv[1:]] or [12.0, 48.0])
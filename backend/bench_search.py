@@ -0,0 +1,113 @@
+"""
+Dan Classic Furniture - Product Search Benchmark
+Compares the full-text search index against the old ILIKE scan on a
+generated catalog. Each timing covers what GET /api/products runs for a
+search page: the total count plus the first page of 12. Uses a throwaway
+SQLite database unless DATABASE_URL is set.
+
+Usage: python bench_search.py [product_count]
+"""
+import sys
+import os
+import random
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_search.db"
+
+from sqlalchemy import select, func, insert
+
+from app.database import SessionLocal, engine, init_db
+from app.models.product import Category, Product
+from app.schemas.product import ProductFilter
+from app.routers.products import filter_products
+from app.utils.search import order_by_relevance
+
+WORDS = [
+    "leather", "fabric", "velvet", "oak", "walnut", "recliner", "sectional",
+    "sofa", "chair", "ottoman", "dining", "office", "classic", "modern",
+    "tufted", "corner", "lounge", "armchair", "bench", "swivel", "grey",
+    "brown", "black", "cream", "teak", "mahogany", "cushioned", "ergonomic",
+]
+# Model names are rare words, as in a real catalog
+MODELS = [f"model{n}" for n in range(20000)]
+QUERIES = ["velvet", "leath", "oak dining", "modern corner sofa", "model1234", "model77"]
+RUNS = 5
+
+
+def populate(count: int) -> None:
+    """Insert a synthetic catalog in batches"""
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        category = Category(name="Benchmark", slug="benchmark")
+        db.add(category)
+        db.commit()
+
+        batch = []
+        for _ in range(count):
+            batch.append({
+                "name": " ".join(rng.choices(WORDS, k=3)).title() + " " + rng.choice(MODELS),
+                "description": " ".join(rng.choices(WORDS, k=25)),
+                "price": rng.randint(5000, 250000),
+                "category_id": category.id,
+                "stock": rng.randint(0, 20),
+                "is_active": True,
+            })
+            if len(batch) == 5000:
+                db.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Product), batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def search_queries(term: str, dialect: str) -> tuple:
+    """The count and page queries get_products runs for a search
+
+    Any dialect without full-text support gets the ILIKE fallback.
+    """
+    query, ranked = filter_products(select(Product), ProductFilter(search=term), dialect)
+    count = select(func.count()).select_from(query.subquery())
+    if ranked:
+        page = order_by_relevance(query, term, dialect)
+    else:
+        page = query.order_by(Product.created_at.desc())
+    return count, page.order_by(Product.id.desc()).limit(12)
+
+
+def time_search(db, term: str, dialect: str) -> tuple[float, int]:
+    """Return the best wall time in ms of a search page and its match count"""
+    count, page = search_queries(term, dialect)
+    best = float("inf")
+    matches = 0
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        matches = db.scalar(count)
+        db.execute(page).all()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, matches
+
+
+def run_benchmark(count: int) -> None:
+    init_db()
+    print(f"Populating {count} products...")
+    populate(count)
+
+    db = SessionLocal()
+    try:
+        print(f"{'query':<22}{'matches':>9}{'ilike ms':>10}{'fts ms':>10}{'speedup':>10}")
+        for term in QUERIES:
+            ilike_ms, _ = time_search(db, term, "ilike")
+            fts_ms, matches = time_search(db, term, engine.dialect.name)
+            print(f"{term:<22}{matches:>9}{ilike_ms:>10.2f}{fts_ms:>10.2f}{ilike_ms / fts_ms:>9.1f}x")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,145 @@
+"""
+Dan Classic Furniture - Catalog Cache Race Check
+Holds a product detail or new arrivals request right after it has read the
+product on a cache miss, updates the product's price through the API while
+it waits, then lets it finish, and fails if the next request is served the
+price read before the update from the cache. Uses a throwaway SQLite
+database unless DATABASE_URL is set.
+
+Usage: python check_cache_race.py
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+from typing import Optional
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/cache_race.db"
+
+import httpx
+from fastapi import Request
+
+from app.main import app
+from app.database import SessionLocal, AsyncSessionLocal, get_db, init_db
+from app.models.user import User, UserRole
+from app.models.product import Category, Product
+from app.utils.auth import create_access_token
+from app.utils.cache import catalog_cache
+
+# (description, URL with {product_id}, session method that loads the products)
+REQUESTS = [
+    ("product detail", "/api/products/{product_id}", "scalar"),
+    ("new arrivals", "/api/products/new-arrivals", "scalars"),
+]
+
+
+class Gate:
+    """Pauses one GET request after a session method returns, until released"""
+
+    def __init__(self, method: str):
+        self.method = method
+        self.armed = True
+        self.paused = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    def hold(self, db) -> None:
+        original = getattr(db, self.method)
+
+        async def held(*args, **kwargs):
+            result = await original(*args, **kwargs)
+            if self.armed:
+                self.armed = False
+                self.paused.set()
+                await self.resume.wait()
+            return result
+
+        setattr(db, self.method, held)
+
+
+gate: Optional[Gate] = None
+
+
+async def gated_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        if gate is not None and request.method == "GET":
+            gate.hold(db)
+        yield db
+
+
+def populate() -> tuple[int, int]:
+    """Create an admin and one product; return their ids"""
+    init_db()
+    db = SessionLocal()
+    try:
+        admin = User(
+            email=f"cache-race-{time.time_ns()}@example.com",
+            phone=f"2547{time.time_ns() % 10**8:08d}",
+            password_hash="!",  # Cannot log in; the check mints tokens directly
+            full_name="Cache Race Admin",
+            role=UserRole.ADMIN
+        )
+        category = Category(name="Cache Race", slug=f"cache-race-{time.time_ns()}")
+        db.add_all([admin, category])
+        db.flush()
+        product = Product(name="Raced Armchair", price=1000, stock=5, category_id=category.id)
+        db.add(product)
+        db.commit()
+        return admin.id, product.id
+    finally:
+        db.close()
+
+
+def price_of(body, product_id: int) -> Optional[float]:
+    products = body if isinstance(body, list) else [body]
+    return next((p["price"] for p in products if p["id"] == product_id), None)
+
+
+async def interleave(client: httpx.AsyncClient, path: str, method: str, product_id: int, price: float, token: str) -> bool:
+    """Update the product while a cache miss for path is between its read and its store"""
+    global gate
+    catalog_cache.clear()
+    gate = Gate(method)
+    try:
+        reader = asyncio.create_task(client.get(path))
+        await gate.paused.wait()
+        response = await client.put(
+            f"/api/products/{product_id}", json={"price": price},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+        gate.resume.set()
+        (await reader).raise_for_status()
+    finally:
+        gate = None
+    response = await client.get(path)
+    response.raise_for_status()
+    return price_of(response.json(), product_id) == price
+
+
+async def check_race(token: str, product_id: int) -> bool:
+    passed = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://race") as client:
+        for n, (description, path, method) in enumerate(REQUESTS, start=1):
+            price = 1000 + 100 * n
+            ok = await interleave(client, path.format(product_id=product_id), method, product_id, price, token)
+            passed = passed and ok
+            print(f"[{'OK' if ok else 'FAIL'}] {description}: {'fresh' if ok else 'stale'} price after a write during a miss")
+    return passed
+
+
+def check_cache_race() -> bool:
+    admin_id, product_id = populate()
+    token = create_access_token({"sub": str(admin_id)})
+    app.dependency_overrides[get_db] = gated_db
+    try:
+        return asyncio.run(check_race(token, product_id))
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_cache_race() else 1)
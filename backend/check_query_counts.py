@@ -0,0 +1,152 @@
+"""
+Dan Classic Furniture - Query Count Check
+Counts the SQL statements behind the catalog endpoints (product list,
+featured, new arrivals, product detail) and the order endpoints (full and
+summary lists, detail), in page and cursor pagination, and fails if the
+count changes with the number of rows on the page (an N+1 regression).
+The catalog cache is cleared before each request so the database is hit.
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+
+Usage: python check_query_counts.py
+"""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_counts.db"
+
+import httpx
+from sqlalchemy import event
+
+from app.main import app
+from app.database import SessionLocal, async_engine, init_db
+from app.models.user import User, UserRole
+from app.models.product import Category, Product
+from app.models.order import Order, OrderItem, OrderTimeline, OrderStatus
+from app.utils.auth import create_access_token
+from app.utils.cache import catalog_cache
+
+ITEMS_PER_ORDER = 3
+PAGE_SIZES = (5, 50)
+SHORT_PAGE_SIZES = (5, 20)  # featured and new arrivals are capped at 20
+
+# (description, URL with {limit} and {product_id}/{order_id}, page sizes, expected statements)
+# Order requests also load the current user.
+REQUESTS = [
+    ("product list", "/api/products?limit={limit}", PAGE_SIZES, 3),
+    ("product list, cursor", "/api/products?limit={limit}&paginate=cursor", PAGE_SIZES, 2),
+    ("featured products", "/api/products/featured?limit={limit}", SHORT_PAGE_SIZES, 2),
+    ("new arrivals", "/api/products/new-arrivals?limit={limit}", SHORT_PAGE_SIZES, 2),
+    ("product detail", "/api/products/{product_id}", (None,), 2),
+    ("order list, full", "/api/orders?limit={limit}", PAGE_SIZES, 4),
+    ("order list, summary", "/api/orders?limit={limit}&view=summary", PAGE_SIZES, 3),
+    ("order list, full, cursor", "/api/orders?limit={limit}&paginate=cursor", PAGE_SIZES, 3),
+    ("order list, summary, cursor", "/api/orders?limit={limit}&paginate=cursor&view=summary", PAGE_SIZES, 2),
+    ("order detail", "/api/orders/{order_id}", (None,), 4),
+]
+
+
+def populate(count: int) -> tuple[int, int, int]:
+    """Create an admin with count featured products and count orders
+    
+    Returns the admin id, one product id and one order id.
+    """
+    init_db()
+    db = SessionLocal()
+    try:
+        admin = User(
+            email=f"counts-{time.time_ns()}@example.com",
+            phone=f"2547{time.time_ns() % 10**8:08d}",
+            password_hash="!",  # Cannot log in; the check mints tokens directly
+            full_name="Query Count Admin",
+            role=UserRole.ADMIN
+        )
+        category = Category(name="Query Counts", slug=f"query-counts-{time.time_ns()}")
+        db.add_all([admin, category])
+        db.flush()
+        products = [
+            Product(
+                name=f"Counted Chair {n}", price=1000, stock=0, category_id=category.id,
+                featured=True, colors=["Oak", "Walnut"], material="Wood"
+            )
+            for n in range(count)
+        ]
+        db.add_all(products)
+        db.flush()
+        product = products[0]
+        for n in range(count):
+            order = Order(
+                order_number=f"QC-{time.time_ns() % 10**10}-{n}",
+                customer_id=admin.id,
+                customer_name=admin.full_name,
+                customer_phone=admin.phone,
+                delivery_address="Query Count Road",
+                subtotal=1000 * ITEMS_PER_ORDER,
+                total=1000 * ITEMS_PER_ORDER,
+                status=OrderStatus.PENDING
+            )
+            order.items = [
+                OrderItem(
+                    product_id=product.id,
+                    product_name=product.name,
+                    product_price=1000,
+                    product_image=f"/uploads/products/chair-{n}-{i}.jpg",
+                    quantity=1
+                )
+                for i in range(ITEMS_PER_ORDER)
+            ]
+            order.timeline = [OrderTimeline(status=OrderStatus.PENDING, note="Order placed")]
+            db.add(order)
+        db.commit()
+        return admin.id, product.id, order.id
+    finally:
+        db.close()
+
+
+async def count_statements(path: str, token: str) -> int:
+    """Request path and return how many SQL statements it ran"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    catalog_cache.clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://counts") as client:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            response = await client.get(path, headers={"Authorization": f"Bearer {token}"})
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    response.raise_for_status()
+    return len(statements)
+
+
+async def check_counts(token: str, product_id: int, order_id: int) -> bool:
+    passed = True
+    for description, path, sizes, expected in REQUESTS:
+        counts = [
+            await count_statements(path.format(limit=limit, product_id=product_id, order_id=order_id), token)
+            for limit in sizes
+        ]
+        ok = all(count == expected for count in counts)
+        passed = passed and ok
+        measured = ", ".join(
+            f"{count} for {limit} rows" if limit else str(count) for count, limit in zip(counts, sizes)
+        )
+        print(f"[{'OK' if ok else 'FAIL'}] {description}: {measured} (expected {expected})")
+    return passed
+
+
+def check_query_counts() -> bool:
+    admin_id, product_id, order_id = populate(60)
+    token = create_access_token({"sub": str(admin_id)})
+    return asyncio.run(check_counts(token, product_id, order_id))
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_counts() else 1)
@@ -0,0 +1,152 @@
+"""
+Dan Classic Furniture - Query Plan Check
+Runs EXPLAIN QUERY PLAN for the main listing, order and dashboard query
+shapes and fails if any of them does not use the expected index. The
+product search shapes fail instead if the FTS match would run once per
+product row rather than once per query.
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+
+Usage: python check_query_plans.py
+"""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_plans.db"
+
+from datetime import datetime
+from sqlalchemy import select, func, text
+
+from app.database import engine, init_db
+from app.models.product import Product, Category, ProductColor
+from app.models.order import Order, OrderItem, OrderTimeline, OrderStatus
+from app.schemas.product import ProductFilter
+from app.routers.products import filter_products
+from app.utils.search import order_by_relevance
+
+SINCE = datetime(2024, 1, 1)
+SEARCH = ProductFilter(search="velvet")
+SEARCH_IN_CATEGORY = ProductFilter(search="velvet sofa", category=1)
+
+# (description, statement, index expected in the plan)
+QUERY_SHAPES = [
+    ("products by category, newest",
+     select(Product).where(Product.is_active == True, Product.category_id == 1)
+     .order_by(Product.created_at.desc()).limit(12),
+     "ix_products_active_category_created"),
+    ("featured products",
+     select(Product).where(Product.is_active == True, Product.featured == True)
+     .order_by(Product.created_at.desc()).limit(8),
+     "ix_products_active_featured_created"),
+    ("low stock products",
+     select(Product).where(Product.is_active == True, Product.stock <= 5)
+     .order_by(Product.stock.asc()),
+     "ix_products_active_stock"),
+    ("orders by status, newest",
+     select(Order).where(Order.status == OrderStatus.PENDING).order_by(Order.created_at.desc()),
+     "ix_orders_status_created"),
+    ("customer orders, newest",
+     select(Order).where(Order.customer_id == 1).order_by(Order.created_at.desc()),
+     "ix_orders_customer_created"),
+    ("orders since date",
+     select(func.count(Order.id)).where(Order.created_at >= SINCE),
+     "ix_orders_created_at"),
+    ("items of orders",
+     select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3])),
+     "ix_order_items_order_id"),
+    ("items of product",
+     select(OrderItem).where(OrderItem.product_id == 1),
+     "ix_order_items_product_id"),
+    ("order timeline",
+     select(OrderTimeline).where(OrderTimeline.order_id == 1),
+     "ix_order_timeline_order_created"),
+]
+
+
+def search_query(filters: ProductFilter, *columns):
+    query, _ = filter_products(select(*columns), filters, "sqlite")
+    return query
+
+
+# (description, statement) for queries that search products
+SEARCH_SHAPES = [
+    ("search page, relevance",
+     order_by_relevance(search_query(SEARCH, Product), SEARCH.search, "sqlite")
+     .order_by(Product.id.desc()).limit(12)),
+    ("search page, price",
+     search_query(SEARCH, Product).order_by(Product.price.asc()).limit(12)),
+    ("search count",
+     select(func.count()).select_from(search_query(SEARCH, Product).subquery())),
+    ("search in category, count",
+     select(func.count()).select_from(search_query(SEARCH_IN_CATEGORY, Product).subquery())),
+    ("search category facet",
+     search_query(SEARCH, Category.id, Category.name, func.count(Product.id))
+     .join(Category, Category.id == Product.category_id)
+     .group_by(Category.id, Category.name)),
+    ("search material facet",
+     search_query(SEARCH, Product.material_key, func.count(Product.id))
+     .where(Product.material_key.is_not(None))
+     .group_by(Product.material_key)),
+    ("search color facet",
+     search_query(SEARCH, ProductColor.color, func.count(Product.id))
+     .join(ProductColor, ProductColor.product_id == Product.id)
+     .group_by(ProductColor.color)),
+]
+
+
+def fts_runs_once(plan: list) -> bool:
+    """True if every products_fts scan in a plan runs a single time
+    
+    That is the case inside an uncorrelated subquery or materialized CTE,
+    or when the scan is the outermost loop; anywhere else it is re-run for
+    each row of the loops around it.
+    """
+    nodes = {row[0]: (row[1], row[-1]) for row in plan}
+    top_loops = [node for node, (parent, detail) in nodes.items()
+                 if parent == 0 and detail.startswith(("SCAN", "SEARCH"))]
+    for node, (parent, detail) in nodes.items():
+        if "products_fts" not in detail:
+            continue
+        if parent == 0:
+            if node != min(top_loops):
+                return False
+            continue
+        while parent:
+            parent, detail = nodes[parent]
+            if detail.startswith("CORRELATED"):
+                return False
+            if detail.startswith(("LIST SUBQUERY", "MATERIALIZE", "SCALAR SUBQUERY")):
+                break
+    return True
+
+
+def check_query_plans() -> bool:
+    if engine.dialect.name != "sqlite":
+        print("[ERROR] Query plan checks only support SQLite")
+        return False
+
+    init_db()
+    passed = True
+    with engine.connect() as conn:
+        def explain(statement) -> list:
+            sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            return conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        
+        for description, statement, index in QUERY_SHAPES:
+            plan = " | ".join(row[-1] for row in explain(statement))
+            ok = index in plan
+            passed = passed and ok
+            print(f"[{'OK' if ok else 'FAIL'}] {description}: {plan}")
+        
+        for description, statement in SEARCH_SHAPES:
+            plan = explain(statement)
+            ok = fts_runs_once(plan)
+            passed = passed and ok
+            print(f"[{'OK' if ok else 'FAIL'}] {description}: {' | '.join(row[-1] for row in plan)}")
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)
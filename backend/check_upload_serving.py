@@ -0,0 +1,87 @@
+"""
+Dan Classic Furniture - Upload Serving Check
+UploadFileResponse overrides two private FileResponse methods
+(_should_use_range and _handle_simple), so a starlette upgrade can drop or
+rename them without any error. Checks that they still exist with the same
+parameters and that serving an upload still goes through them: whole files
+are sent with http.response.pathsend when the server offers it, and
+If-Range is checked against the upload ETag.
+
+Usage: python check_upload_serving.py
+"""
+import sys
+import os
+import asyncio
+import inspect
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from starlette.responses import FileResponse
+
+from app.utils.static import UploadFileResponse, UploadFiles, upload_etag
+
+HOOKS = ("_should_use_range", "_handle_simple")
+CONTENT = bytes(range(256)) * 64
+
+
+def parameters(function) -> list[str]:
+    return [name for name in inspect.signature(function).parameters if name != "self"]
+
+
+async def serve(app: UploadFiles, name: str, headers: dict, extensions: dict) -> list[dict]:
+    """Request /name from app and return the ASGI messages it sent"""
+    messages = []
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/{name}", "raw_path": f"/{name}".encode(), "root_path": "", "query_string": b"",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        "server": ("uploads", 80), "extensions": extensions,
+    }
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+async def check_serving(directory: Path) -> list[tuple[str, bool]]:
+    path = directory / "chair.jpg"
+    path.write_bytes(CONTENT)
+    etag = upload_etag(path, path.stat())
+    app = UploadFiles(directory=directory)
+
+    pathsend = await serve(app, path.name, {}, {"http.response.pathsend": {}})
+    plain = await serve(app, path.name, {}, {})
+    matching = await serve(app, path.name, {"Range": "bytes=0-9", "If-Range": etag}, {})
+    stale = await serve(app, path.name, {"Range": "bytes=0-9", "If-Range": '"other"'}, {})
+    return [
+        ("whole file sent with pathsend",
+         [m["type"] for m in pathsend] == ["http.response.start", "http.response.pathsend"]),
+        ("whole file streamed without pathsend",
+         b"".join(m.get("body", b"") for m in plain) == CONTENT),
+        ("range with matching If-Range ETag is partial", matching[0]["status"] == 206),
+        ("range with stale If-Range is the whole file", stale[0]["status"] == 200),
+    ]
+
+
+def check_upload_serving() -> bool:
+    results = [
+        (f"FileResponse.{hook} exists with the overridden parameters",
+         hasattr(FileResponse, hook)
+         and parameters(getattr(FileResponse, hook)) == parameters(getattr(UploadFileResponse, hook)))
+        for hook in HOOKS
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        results += asyncio.run(check_serving(Path(directory)))
+    for description, ok in results:
+        print(f"[{'OK' if ok else 'FAIL'}] {description}")
+    return all(ok for _, ok in results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_upload_serving() else 1)
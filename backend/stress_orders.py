@@ -0,0 +1,127 @@
+"""
+Dan Classic Furniture - Order Concurrency Stress Test
+Fires hundreds of parallel checkouts at a few low-stock products through
+the real API and checks that stock is never oversold and that every unit
+taken from stock belongs to a placed order. Uses a throwaway SQLite
+database unless DATABASE_URL is set.
+
+Usage: python stress_orders.py [order_count]
+"""
+import sys
+import os
+import asyncio
+import random
+import tempfile
+import time
+from collections import Counter
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/stress_orders.db"
+
+import httpx
+from sqlalchemy import select, func
+
+from app.main import app
+from app.database import SessionLocal, init_db
+from app.models.user import User, UserRole
+from app.models.product import Category, Product
+from app.models.order import OrderItem
+from app.utils.auth import create_access_token
+
+CUSTOMERS = 20
+# Product name -> starting stock
+STOCK = {"Last Chesterfield Sofa": 1, "Oak Dining Chair": 3, "Velvet Ottoman": 5, "Office Chair": 8}
+
+
+def populate() -> tuple[list[int], dict[int, int]]:
+    """Create customers and low-stock products; return customer ids and stock by product id"""
+    init_db()
+    db = SessionLocal()
+    try:
+        category = Category(name="Stress Test", slug=f"stress-test-{int(time.time())}")
+        db.add(category)
+        customers = [
+            User(
+                email=f"stress{n}-{time.time_ns()}@example.com",
+                phone=f"2547{time.time_ns() % 10**8:08d}{n:02d}",
+                password_hash="!",  # Cannot log in; the test mints tokens directly
+                full_name=f"Stress Customer {n}",
+                role=UserRole.CUSTOMER
+            )
+            for n in range(CUSTOMERS)
+        ]
+        db.add_all(customers)
+        db.flush()
+        products = [
+            Product(name=name, price=1000, stock=stock, category_id=category.id)
+            for name, stock in STOCK.items()
+        ]
+        db.add_all(products)
+        db.commit()
+        return [user.id for user in customers], {product.id: product.stock for product in products}
+    finally:
+        db.close()
+
+
+async def place_orders(customer_ids: list[int], product_ids: list[int], count: int) -> Counter:
+    """Send count concurrent orders of 1-2 random items each; return status code counts"""
+    rng = random.Random(7)
+    tokens = {uid: create_access_token({"sub": str(uid)}) for uid in customer_ids}
+    start = asyncio.Event()
+    
+    async def order(client: httpx.AsyncClient) -> int:
+        items = [
+            {"product_id": product_id, "quantity": rng.randint(1, 2)}
+            for product_id in rng.sample(product_ids, rng.randint(1, 2))
+        ]
+        headers = {"Authorization": f"Bearer {tokens[rng.choice(customer_ids)]}"}
+        body = {"items": items, "delivery_address": "Stress Test Lane, Nairobi"}
+        await start.wait()
+        response = await client.post("/api/orders", json=body, headers=headers)
+        return response.status_code
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=120) as client:
+        tasks = [asyncio.create_task(order(client)) for _ in range(count)]
+        await asyncio.sleep(0)
+        start.set()  # Release every request at once
+        return Counter(await asyncio.gather(*tasks))
+
+
+def check(initial: dict[int, int]) -> bool:
+    """Compare remaining stock with what the placed orders took"""
+    db = SessionLocal()
+    try:
+        ok = True
+        for product_id, starting in initial.items():
+            product = db.get(Product, product_id)
+            ordered = db.scalar(
+                select(func.coalesce(func.sum(OrderItem.quantity), 0))
+                .where(OrderItem.product_id == product_id)
+            )
+            consistent = product.stock >= 0 and starting - product.stock == ordered
+            ok = ok and consistent
+            print(f"[{'OK' if consistent else 'FAIL'}] {product.name}: "
+                  f"start {starting}, ordered {ordered}, left {product.stock}")
+        return ok
+    finally:
+        db.close()
+
+
+def run_stress_test(count: int) -> bool:
+    customer_ids, initial = populate()
+    started = time.perf_counter()
+    statuses = asyncio.run(place_orders(customer_ids, list(initial), count))
+    elapsed = time.perf_counter() - started
+    
+    print(f"{count} concurrent orders in {elapsed:.2f}s: "
+          + ", ".join(f"{code} x{n}" for code, n in sorted(statuses.items())))
+    unexpected = {code: n for code, n in statuses.items() if code not in (201, 400)}
+    if unexpected:
+        print(f"[FAIL] Unexpected responses: {unexpected}")
+    return check(initial) and not unexpected
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_stress_test(int(sys.argv[1]) if len(sys.argv) > 1 else 300) else 1)
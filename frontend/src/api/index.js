@@ -100,7 +100,10 @@ export const categoriesAPI = {
 export const ordersAPI = {
     getAll: (params) => api.get('/orders', { params }),
     getById: (id) => api.get(`/orders/${id}`),
-    create: (data) => api.post('/orders', data),
+    // Reuse the same idempotencyKey when retrying a checkout so it is only placed once
+    create: (data, idempotencyKey) => api.post('/orders', data, {
+        headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+    }),
     updateStatus: (id, data) => api.put(`/orders/${id}/status`, data),
     cancel: (id) => api.delete(`/orders/${id}`),
 };
@@ -13,6 +13,22 @@ export default function ProductCard({ product }) {
         ? `${API_HOST}${product.images[0]}`
         : null; // No image - will show icon placeholder
 
+    // Responsive sizes generated at upload; older images are resized on demand
+    const uploadedVariants = Object.values(product.image_variants?.[product.images?.[0]] || {});
+    const variants = (uploadedVariants.length || !imageUrl
+        ? uploadedVariants
+        : [320, 640].map((width) => ({
+            width,
+            jpeg: `/uploads/resize/${width}x${width}${product.images[0].replace(/^\/uploads/, '')}`,
+        }))
+    ).sort((a, b) => a.width - b.width);
+    const srcSet = (format) => variants
+        .map((variant) => `${API_HOST}${variant[format]} ${variant.width}w`)
+        .join(', ');
+    const sizes = '(min-width: 1024px) 33vw, 50vw';
+    // Tiny inline preview shown behind the image until it loads
+    const placeholder = product.image_placeholders?.[product.images?.[0]];
+
     const handleAddToCart = (e) => {
         e.preventDefault();
         e.stopPropagation();
@@ -29,14 +45,24 @@ export default function ProductCard({ product }) {
             className="group bg-white rounded-xl overflow-hidden shadow-sm border border-gray-100 hover:shadow-lg transition-all duration-300 flex flex-col h-full"
         >
             {/* Image */}
-            <div className="relative aspect-square overflow-hidden bg-gray-100">
+            <div
+                className="relative aspect-square overflow-hidden bg-gray-100 bg-cover bg-center"
+                style={placeholder ? { backgroundImage: `url(${placeholder})` } : undefined}
+            >
                 {imageUrl ? (
-                    <img
-                        src={imageUrl}
-                        alt={product.name}
-                        className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
-                        loading="lazy"
-                    />
+                    <picture>
+                        {variants.some((variant) => variant.webp) && (
+                            <source type="image/webp" srcSet={srcSet('webp')} sizes={sizes} />
+                        )}
+                        <img
+                            src={imageUrl}
+                            srcSet={variants.length > 0 ? srcSet('jpeg') : undefined}
+                            sizes={variants.length > 0 ? sizes : undefined}
+                            alt={product.name}
+                            className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
+                            loading="lazy"
+                        />
+                    </picture>
                 ) : (
                     <div className="w-full h-full flex items-center justify-center bg-gradient-to-br from-gray-100 to-gray-200">
                         <i className="fas fa-couch text-4xl text-gray-300"></i>
@@ -26,7 +26,7 @@ export default function OrderManagement() {
 
     useEffect(() => {
         setLoading(true);
-        ordersAPI.getAll({ status, page, limit: 20 })
+        ordersAPI.getAll({ status, page, limit: 20, view: 'summary' })
             .then((res) => {
                 setOrders(res.data.orders);
                 setPagination({